@@ -1,5 +1,168 @@
 import os
+import sys
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# optional; derived from DATABASE_URL (postgresql+asyncpg://...) when unset
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+# async engine pool: at most DB_POOL_SIZE + DB_MAX_OVERFLOW connections per worker
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# "create_all" creates missing tables at startup (local development);
+# "none" runs no DDL – the schema comes from `alembic upgrade head`
+DB_SCHEMA_MODE = os.getenv("DB_SCHEMA_MODE", "create_all")
 SECRET_KEY = os.getenv("SECRET_KEY", "CHANGEME")
 ALGORITHM = "HS256"
+
+# -------------------------------------
+# Piston executor
+# -------------------------------------
+PUBLIC_PISTON_URL = "https://emkc.org/api/v2/piston/execute"
+PISTON_URL = os.getenv("PISTON_URL", PUBLIC_PISTON_URL)
+PISTON_TIMEOUT = float(os.getenv("PISTON_TIMEOUT", "10"))
+PISTON_CONNECT_TIMEOUT = float(os.getenv("PISTON_CONNECT_TIMEOUT", "5"))
+PISTON_MAX_CONNECTIONS = int(os.getenv("PISTON_MAX_CONNECTIONS", "100"))
+PISTON_MAX_KEEPALIVE = int(os.getenv("PISTON_MAX_KEEPALIVE", "20"))
+PISTON_KEEPALIVE_EXPIRY = float(os.getenv("PISTON_KEEPALIVE_EXPIRY", "30"))
+PISTON_HTTP2 = os.getenv("PISTON_HTTP2", "true").lower() == "true"
+
+# -------------------------------------
+# Code executor backend
+# -------------------------------------
+# "piston" – remote Piston API, "local" – one sandboxed subprocess per run,
+# "warm" – pool of warm sandboxed interpreters reused across runs
+EXECUTOR_BACKEND = os.getenv("EXECUTOR_BACKEND", "piston")
+LOCAL_EXECUTOR_WORKERS = int(os.getenv("LOCAL_EXECUTOR_WORKERS", "4"))
+LOCAL_EXECUTOR_TIMEOUT = float(os.getenv("LOCAL_EXECUTOR_TIMEOUT", "5"))
+LOCAL_EXECUTOR_CPU_SECONDS = int(os.getenv("LOCAL_EXECUTOR_CPU_SECONDS", "3"))
+LOCAL_EXECUTOR_MEMORY_MB = int(os.getenv("LOCAL_EXECUTOR_MEMORY_MB", "256"))
+LOCAL_EXECUTOR_PYTHON = os.getenv("LOCAL_EXECUTOR_PYTHON", sys.executable)
+# submissions run as this unprivileged user (never the server's), in their
+# own network / mount namespaces; the local and warm backends need root or
+# CAP_SYS_ADMIN + CAP_SETUID + CAP_SETGID for that and refuse to start without
+SANDBOX_UID = int(os.getenv("SANDBOX_UID", "10001"))
+SANDBOX_GID = int(os.getenv("SANDBOX_GID", "10001"))
+
+# warm worker pool (EXECUTOR_BACKEND=warm): size is LOCAL_EXECUTOR_WORKERS
+# 1 = a fresh interpreter per submission; a submission can tamper with the
+# interpreter that runs it, so only raise this for trusted code
+WARM_POOL_MAX_RUNS = int(os.getenv("WARM_POOL_MAX_RUNS", "1"))
+WARM_POOL_MAX_RSS_MB = int(os.getenv("WARM_POOL_MAX_RSS_MB", "128"))
+# runs allowed to wait for a free worker before new ones are rejected (0 = no cap)
+WARM_POOL_MAX_QUEUE = int(os.getenv("WARM_POOL_MAX_QUEUE", "200"))
+
+# -------------------------------------
+# Verification
+# -------------------------------------
+# "concurrent" runs all tests of a submission at once, "sequential" one by one,
+# "batch" sends all tests to the executor in a single invocation
+VERIFY_MODE = os.getenv("VERIFY_MODE", "concurrent")
+# max tests of a single submission that run at the same time; the public
+# Piston API is rate limited, so against it tests run one at a time
+_PUBLIC_PISTON = EXECUTOR_BACKEND == "piston" and PISTON_URL == PUBLIC_PISTON_URL
+VERIFY_CONCURRENCY = int(os.getenv("VERIFY_CONCURRENCY", "1" if _PUBLIC_PISTON else "8"))
+
+# -------------------------------------
+# Verdict cache
+# -------------------------------------
+VERDICT_CACHE_SIZE = int(os.getenv("VERDICT_CACHE_SIZE", "10000"))
+VERDICT_CACHE_TTL = float(os.getenv("VERDICT_CACHE_TTL", "3600"))
+
+# -------------------------------------
+# Problem selection
+# -------------------------------------
+# full reload of the in-process problem id index (picks up other workers' inserts)
+PROBLEM_INDEX_REFRESH_SECONDS = float(os.getenv("PROBLEM_INDEX_REFRESH_SECONDS", "300"))
+
+# bitset of seen problem ids per user, for picking a problem neither player saw
+SEEN_CACHE_SIZE = int(os.getenv("SEEN_CACHE_SIZE", "10000"))
+# other workers' rounds are picked up after this many seconds
+SEEN_CACHE_TTL = float(os.getenv("SEEN_CACHE_TTL", "600"))
+
+# problem snapshots (with tests) served to the submit paths and rooms;
+# fully reloaded this often (background task, 0 = never) to pick up other workers' changes
+PROBLEM_CATALOG_REFRESH_SECONDS = float(os.getenv("PROBLEM_CATALOG_REFRESH_SECONDS", "600"))
+
+# problems written per transaction by the bulk NDJSON import
+PROBLEM_IMPORT_BATCH = int(os.getenv("PROBLEM_IMPORT_BATCH", "500"))
+
+# -------------------------------------
+# Room WebSockets
+# -------------------------------------
+# a client that takes longer than this to accept one message is dropped
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "2"))
+# "orjson" (falls back to "json" when orjson is not installed) or "json"
+WS_JSON_ENCODER = os.getenv("WS_JSON_ENCODER", "orjson")
+# "memory" (single worker) or "redis" (rooms shared by every worker / host)
+BACKPLANE = os.getenv("BACKPLANE", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# key / channel prefix, so several deployments can share one Redis
+BACKPLANE_PREFIX = os.getenv("BACKPLANE_PREFIX", "bughunt")
+
+# -------------------------------------
+# Room engine / write-behind
+# -------------------------------------
+# room state changes are persisted in batches of up to this many writes ...
+WRITE_BEHIND_BATCH = int(os.getenv("WRITE_BEHIND_BATCH", "200"))
+# ... collected for at most this many milliseconds
+WRITE_BEHIND_INTERVAL_MS = float(os.getenv("WRITE_BEHIND_INTERVAL_MS", "20"))
+
+# -------------------------------------
+# Matchmaking
+# -------------------------------------
+# seconds /rooms/find-match waits in the queue before opening a waiting room
+MATCH_TIMEOUT = float(os.getenv("MATCH_TIMEOUT", "8"))
+# players are paired within score buckets of this width (0 = ignore score)
+MATCH_SCORE_BUCKET = int(os.getenv("MATCH_SCORE_BUCKET", "0"))
+
+# -------------------------------------
+# Room reaper
+# -------------------------------------
+REAPER_INTERVAL_SECONDS = float(os.getenv("REAPER_INTERVAL_SECONDS", "30"))
+# waiting / playing rooms without a connected player, older than this
+REAPER_EMPTY_ROOM_AGE = float(os.getenv("REAPER_EMPTY_ROOM_AGE", "60"))
+# waiting / playing rooms older than this whatever their connected flags
+# (flags left behind by a crashed worker); 0 = never
+REAPER_MAX_ROOM_AGE = float(os.getenv("REAPER_MAX_ROOM_AGE", "43200"))
+# finished rooms older than this (match history keeps its own copy); 0 = keep
+REAPER_FINISHED_ROOM_AGE = float(os.getenv("REAPER_FINISHED_ROOM_AGE", "0"))
+# rooms deleted per transaction
+REAPER_BATCH = int(os.getenv("REAPER_BATCH", "500"))
+
+# -------------------------------------
+# Auth caches
+# -------------------------------------
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+# decoded tokens (never past the token's own exp)
+AUTH_CLAIMS_TTL = float(os.getenv("AUTH_CLAIMS_TTL", "300"))
+# user rows by id
+AUTH_USER_TTL = float(os.getenv("AUTH_USER_TTL", "30"))
+# endpoints that only need id / username / is_admin read them from the
+# signed token instead of the DB
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "true").lower() in ("1", "true", "yes")
+
+# -------------------------------------
+# Password hashing
+# -------------------------------------
+# bcrypt cost; hashes with another cost are rehashed on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# processes dedicated to bcrypt (never the request threadpool), per uvicorn
+# worker – keep workers x HASH_WORKERS around the number of cores
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "2"))
+# hash / verify jobs admitted at once (running + queued); more get a 503
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "64"))
+
+# -------------------------------------
+# Leaderboard
+# -------------------------------------
+# full reload of the in-memory ranking (picks up other workers' score changes)
+LEADERBOARD_REFRESH_SECONDS = float(os.getenv("LEADERBOARD_REFRESH_SECONDS", "60"))
+# Cache-Control max-age of the leaderboard responses (they also carry an ETag)
+LEADERBOARD_MAX_AGE = int(os.getenv("LEADERBOARD_MAX_AGE", "5"))
+
+# -------------------------------------
+# Match history
+# -------------------------------------
+# default page size of /users/{id}/matches (next pages via X-Next-Cursor)
+MATCHES_PAGE_SIZE = int(os.getenv("MATCHES_PAGE_SIZE", "50"))
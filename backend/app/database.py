@@ -1,6 +1,16 @@
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
-from app.config import DATABASE_URL
+from app.config import (
+    DATABASE_URL,
+    ASYNC_DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+)
 
 engine = create_engine(
     DATABASE_URL,
@@ -14,3 +24,51 @@ SessionLocal = sessionmaker(
 )
 
 Base = declarative_base()
+
+
+# -------------------------------------
+# Async engine (asyncpg)
+# -------------------------------------
+def _async_url(url: str) -> str:
+    # postgresql://... -> postgresql+asyncpg://..., sslmode -> ssl for asyncpg
+    u = make_url(url)
+    if u.get_backend_name() == "postgresql":
+        query = dict(u.query)
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        u = u.set(drivername="postgresql+asyncpg", query=query)
+    elif u.get_backend_name() == "sqlite":
+        u = u.set(drivername="sqlite+aiosqlite")
+    return u.render_as_string(hide_password=False)
+
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL or _async_url(DATABASE_URL),
+    pool_pre_ping=True,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+)
+
+# expire_on_commit=False: rows stay readable after commit without a new query
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+
+# -------------------------------------
+# DB dependency
+# -------------------------------------
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def dialect_insert(db):
+    """`insert` of the session's dialect – for ON CONFLICT (Postgres / SQLite)."""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
@@ -0,0 +1,46 @@
+"""
+Bulk import of a problem library from NDJSON, one ProblemCreate per line:
+
+    cd backend
+    python -m app.import_problems problems.ndjson [--batch 500]
+    cat problems.ndjson | python -m app.import_problems -
+
+Problems are upserted by title (an existing problem gets the record's
+fields and tests). Running API workers pick the changes up on their next
+problem index / catalog reload.
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from app.config import PROBLEM_IMPORT_BATCH
+from app.database import async_engine
+from app.services.problem_import import import_problems, ndjson_lines
+
+
+async def _chunks(f, size: int = 1 << 16):
+    while chunk := f.read(size):
+        yield chunk
+
+
+async def main(path: str, batch_size: int) -> dict:
+    f = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        return await import_problems(ndjson_lines(_chunks(f)), batch_size)
+    finally:
+        if f is not sys.stdin.buffer:
+            f.close()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import problems from an NDJSON file")
+    parser.add_argument("path", help="NDJSON file, or - for stdin")
+    parser.add_argument("--batch", type=int, default=PROBLEM_IMPORT_BATCH,
+                        help="problems per transaction")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args.path, args.batch))
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report["failed"] else 0)
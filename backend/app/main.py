@@ -1,32 +1,75 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import rooms
 
-from app.database import Base, engine
+from app.config import DB_SCHEMA_MODE
+from app.database import Base, async_engine, AsyncSessionLocal
 from app.models import user
 from app.routers import auth
 from app.routers.problems import router as problems_router
 from app.routers import ws_rooms
 from app.routers.user import router as user_router
 from app.routers.test_piston import router as test_piston_router
+from app.services.executor import start_executor, close_executor
+from app.services.problem_index import problem_index
+from app.services.problem_catalog import problem_catalog
+from app.services.leaderboard import leaderboard
+from app.services.connection_manager import manager
+from app.services.write_behind import write_behind
+from app.services.room_reaper import room_reaper
+from app.services.password_hasher import password_hasher
 
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # schema: migrations in production (DB_SCHEMA_MODE=none), create_all locally
+    if DB_SCHEMA_MODE == "create_all":
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    # code executor: shared Piston HTTP client or pre-started local workers
+    await start_executor()
+    # room backplane: events of rooms whose other player is on another worker
+    await manager.start()
+    # room engine writes (rounds, scores, connected flags), batched and ordered
+    await write_behind.start()
+    # problem ids by difficulty / language – random picks never scan the table
+    # problem snapshots with their tests – submissions never read problems
+    # users ranked by score – leaderboard / rank lookups never ORDER BY users
+    async with AsyncSessionLocal() as db:
+        await problem_index.load(db)
+        await problem_catalog.load(db)
+        await leaderboard.load(db)
+    # other workers' problem changes are reloaded in the background, not per request
+    await problem_catalog.start()
+    # abandoned rooms are deleted in the background, not in find-match
+    await room_reaper.start()
+    # bcrypt processes for register / login
+    await password_hasher.start()
+    yield
+    await password_hasher.close()
+    await room_reaper.close()
+    await problem_catalog.close()
+    await manager.close()
+    # drain pending room writes before the engine goes away
+    await write_behind.close()
+    await close_executor()
+    await async_engine.dispose()
 
 
-
-
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # או ["http://localhost:5173"]
     allow_credentials=True,
     allow_methods=["*"],  # חשוב!!!
     allow_headers=["*"],  # חשוב!!!
+    # readable by the browser: match history paging, leaderboard revalidation
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
-# יוצר את כל הטבלאות
-Base.metadata.create_all(bind=engine)
 app.include_router(auth.router)
 app.include_router(problems_router)
 app.include_router(rooms.router)
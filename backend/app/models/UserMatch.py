@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index
 from app.database import Base
 
 class UserMatch(Base):
@@ -13,3 +13,8 @@ class UserMatch(Base):
     rounds_won = Column(Integer)
     rounds_lost = Column(Integer)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # match history pages: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_user_matches_user_created_id", "user_id", created_at.desc(), id.desc()),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, DateTime
+from sqlalchemy import Column, Integer, DateTime, Index
 from datetime import datetime
 from app.database import Base
 
@@ -10,3 +10,9 @@ class UserSeenProblem(Base):
     user_id = Column(Integer, nullable=False)
     problem_id = Column(Integer, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # one row per (user, problem): bulk marks use ON CONFLICT DO NOTHING,
+        # and seen lookups by user_id use its prefix
+        Index("ux_user_seen_problem_user_problem", "user_id", "problem_id", unique=True),
+    )
@@ -3,3 +3,5 @@ from .problem import Problem
 from .room import Room
 from .room_player import RoomPlayer
 from .active_problem import ActiveProblem
+from .UserMatch import UserMatch
+from .user_stats import UserStats
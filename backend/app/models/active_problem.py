@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base  # שים לב לנתיב הנכון!
 
@@ -11,6 +11,11 @@ class ActiveProblem(Base):
     winner_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     round_number = Column(Integer, default=1)
 
+    __table_args__ = (
+        # latest round of a room: WHERE room_id = ? ORDER BY round_number DESC
+        Index("ix_active_problems_room_round", "room_id", "round_number"),
+    )
+
     # relationships
     room = relationship("Room", back_populates="active_problems")
     problem = relationship("Problem")
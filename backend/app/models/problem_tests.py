@@ -6,6 +6,6 @@ class ProblemTest(Base):
     __tablename__ = "problem_tests"
 
     id = Column(Integer, primary_key=True, index=True)
-    problem_id = Column(Integer, ForeignKey("problems.id"))
+    problem_id = Column(Integer, ForeignKey("problems.id"), index=True)
     input = Column(String, nullable=True)
     expected_output = Column(String, nullable=False)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index, text
 from sqlalchemy.orm import relationship
 
 from datetime import datetime
@@ -21,4 +21,13 @@ class Room(Base):
     active_problems = relationship("ActiveProblem", back_populates="room")
     players = relationship("RoomPlayer", back_populates="room")
 
+    __table_args__ = (
+        # only the few open rooms – matchmaking and the reaper look for these
+        Index(
+            "ix_rooms_open_status_created", "status", "created_at",
+            postgresql_where=text("status IN ('waiting', 'playing')"),
+            sqlite_where=text("status IN ('waiting', 'playing')"),
+        ),
+    )
+
 
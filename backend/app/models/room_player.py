@@ -7,8 +7,8 @@ class RoomPlayer(Base):
 
     id = Column(Integer, primary_key=True)
     
-    room_id = Column(Integer, ForeignKey("rooms.id"))
-    user_id = Column(Integer, ForeignKey("users.id"))
+    room_id = Column(Integer, ForeignKey("rooms.id"), index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
 
     score_in_room = Column(Integer, default=0)
     connected = Column(Boolean, default=False)
@@ -8,7 +8,7 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True, nullable=False)
     password_hash = Column(String, nullable=False)
-    score = Column(Integer, default=0)
+    score = Column(Integer, default=0, index=True)
     is_admin = Column(Boolean, default=False)  # False = regular user, True = admin 
     email = Column(String, unique=True, index=True, nullable=False  )
     # is_verified = Column(Boolean, default=False)
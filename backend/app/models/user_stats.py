@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, ForeignKey
+from app.database import Base
+
+
+class UserStats(Base):
+    """Match totals of a user, bumped by finish_room (see app/services/user_stats.py)."""
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    matches = Column(Integer, nullable=False, default=0)
+    wins = Column(Integer, nullable=False, default=0)
+    losses = Column(Integer, nullable=False, default=0)
+    draws = Column(Integer, nullable=False, default=0)
+    rounds_won = Column(Integer, nullable=False, default=0)
+    rounds_lost = Column(Integer, nullable=False, default=0)
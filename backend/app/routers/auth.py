@@ -1,51 +1,73 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.security import hash_password, create_access_token, verify_password,get_current_user
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.security import create_access_token, get_current_user
 
-from app.database import SessionLocal
+from app.database import get_async_db
 from app.schemas.user import UserCreate, UserLogin, UserResponse
 from app.models.user import User
+from app.services.password_hasher import password_hasher, HasherBusy
+from app.services.leaderboard import leaderboard
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-def get_db():
-    db = SessionLocal()
+
+async def _bcrypt(job):
     try:
-        yield db
-    finally:
-        db.close()
+        return await job
+    except HasherBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many login attempts right now, try again shortly",
+            headers={"Retry-After": "1"}
+        )
+
 
 @router.post("/register")
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # check if exists user with same username
-    existing = db.query(User).filter(User.username == user.username).first()
+    existing = await db.scalar(select(User).where(User.username == user.username))
     if existing:
         raise HTTPException(status_code=400, detail="Username already exists")
     
-    existing_email = db.query(User).filter(User.email == user.email).first()
+    existing_email = await db.scalar(select(User).where(User.email == user.email))
     if existing_email:
         raise HTTPException(status_code=400, detail="Email already exists")
 
 
-    hashed = hash_password(user.password)
+    # bcrypt is CPU-bound – runs on the dedicated hashing processes
+    hashed = await _bcrypt(password_hasher.hash(user.password))
     new_user = User(username=user.username, password_hash=hashed,email=user.email)
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    leaderboard.set_score(new_user.id, new_user.username, 0)
 
     return {"message": "registered successfully", "username": new_user.username}
 @router.post("/login")
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == user.username).first()
+async def login(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.scalar(select(User).where(User.username == user.username))
 
     if not db_user:
         raise HTTPException(status_code=401, detail="Invalid username or password")
 
-    if not verify_password(user.password, db_user.password_hash):
+    ok, new_hash = await _bcrypt(
+        password_hasher.verify_and_update(user.password, db_user.password_hash)
+    )
+    if not ok:
         raise HTTPException(status_code=401, detail="Invalid username or password")
 
-    token = create_access_token({"sub": str(db_user.id)})
+    if new_hash:
+        # stored with an outdated bcrypt cost – upgrade it now that we know the password
+        db_user.password_hash = new_hash
+        await db.commit()
+
+    # username / is_admin are signed into the token (get_current_identity)
+    token = create_access_token({
+        "sub": str(db_user.id),
+        "username": db_user.username,
+        "is_admin": bool(db_user.is_admin)
+    })
 
     return {
         "access_token": token,
@@ -57,5 +79,5 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
     }
 
 @router.get("/me", response_model=UserResponse)
-def get_me(current_user = Depends(get_current_user)):
+async def get_me(current_user = Depends(get_current_user)):
     return current_user
\ No newline at end of file
@@ -1,84 +1,91 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-import random
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import SessionLocal
+from app.config import PROBLEM_IMPORT_BATCH
+from app.database import get_async_db
 from app.models.problem import Problem
-from app.models.user import User
-from app.security import get_current_user
+from app.security import get_current_identity
+from app.services.auth_cache import Identity
 from app.schemas.problem import SubmitRequest
 from app.schemas.problem import ProblemCreate, ProblemResponse, SubmitResponse
 import app.models.problem_tests as  problem_tests_model
 from app.services.verify import verify_solution
+from app.services.executor import TRANSIENT_ERRORS
+from app.services.verdict_cache import verdict_cache
+from app.services.problem_index import problem_index
+from app.services.problem_catalog import problem_catalog
+from app.services.problem_import import import_problems, ndjson_lines
 ProblemTest = problem_tests_model.ProblemTest
 
 router = APIRouter(prefix="/problems", tags=["problems"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()  
-
 @router.post("/", response_model=ProblemResponse)
-def create_problem(problem: ProblemCreate, db: Session = Depends(get_db)):
-    # צור את הבעיה עצמה
+async def create_problem(problem: ProblemCreate, db: AsyncSession = Depends(get_async_db)):
+    # צור את הבעיה עצמה, עם הטסטים, בטרנזקציה אחת
     p = Problem(
         title=problem.title,
         description=problem.description,
         language=problem.language,
         difficulty=problem.difficulty,
         code_with_bug=problem.code_with_bug,
-        fixed_code=problem.fixed_code
+        fixed_code=problem.fixed_code,
+        tests=[
+            ProblemTest(input=t.input, expected_output=t.expected_output)
+            for t in problem.tests
+        ]
     )
     db.add(p)
-    db.commit()
-    db.refresh(p)
-
-    # צור את הטסטים
-    for t in problem.tests:
-        test_row = ProblemTest(
-            problem_id=p.id,
-            input=t.input,
-            expected_output=t.expected_output
-        )
-        db.add(test_row)
-
-    db.commit()
-    db.refresh(p)
-
-    return p
+    await db.commit()
+
+    # tests of this problem id changed – drop old verdicts
+    verdict_cache.invalidate_problem(p.id)
+    problem_index.add(p.id, p.difficulty, p.language)
+    return problem_catalog.put(p)
+
+
+@router.post("/import")
+async def import_problem_library(
+    request: Request,
+    batch_size: int = Query(PROBLEM_IMPORT_BATCH, ge=1, le=5000),
+    current_user: Identity = Depends(get_current_identity)
+):
+    """
+    Bulk import / update (by title) from an NDJSON body, one ProblemCreate
+    per line. The body is streamed, never held in memory as a whole; bad
+    records are reported by line number and skipped.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admins only")
+    return await import_problems(ndjson_lines(request.stream()), batch_size)
 
 
 @router.get("/", response_model=ProblemResponse)
-def get_random_problem(difficulty: str | None = None,
-                       db: Session = Depends(get_db)):
-
-    query = db.query(Problem)
+async def get_random_problem(difficulty: str | None = None,
+                             db: AsyncSession = Depends(get_async_db)):
 
-    # אם difficulty לא None ולא ""
-    if difficulty:
-        problems = query.filter(Problem.difficulty == difficulty).all()
-    else:
-        problems = query.all()
+    # אם difficulty לא None ולא "" – ה-index מטפל בזה
+    problem = await problem_index.pick(db, difficulty=difficulty)
 
-    if not problems:
+    if not problem:
         raise HTTPException(status_code=404, detail="No problems available")
 
-    return random.choice(problems)
+    return problem
 
 @router.post("/submit", response_model=SubmitResponse)
 async def submit_solution(req: SubmitRequest, 
-                    db: Session = Depends(get_db),
-                    current_user: User = Depends(get_current_user)):
+                    db: AsyncSession = Depends(get_async_db),
+                    current_user: Identity = Depends(get_current_identity)):
 
-    problem = db.query(Problem).filter(Problem.id == req.problem_id).first()
+    # immutable snapshot with its tests – no DB read once the catalog is warm
+    problem = await problem_catalog.get(db, req.problem_id)
     if not problem:
         raise HTTPException(404, "Problem not found")
 
     # בדיקה אמיתית מול Piston
     is_correct, out, expected, stderr = await verify_solution(req.solution, problem)
+    if stderr in TRANSIENT_ERRORS:
+        # the executor could not run it – not a verdict about the solution
+        raise HTTPException(503, stderr)
 
     return {
         "correct": is_correct,
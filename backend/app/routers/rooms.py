@@ -1,34 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, select
 import uuid
-from sqlalchemy import func, case
-from app.models.active_problem import ActiveProblem
+from sqlalchemy import func
 
 
 
 
-from app.database import SessionLocal
+from app.database import get_async_db
 from app.models.room import Room
 from app.models.room_player import RoomPlayer
-from app.models.user import User
-from app.security import get_current_user
+from app.security import get_current_user, get_current_identity
+from app.services.auth_cache import CachedUser, Identity
+from app.services.matchmaking import matchmaker
 
 
 router = APIRouter(prefix="/rooms", tags=["rooms"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/create-private")
-def create_private_room(
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+async def create_private_room(
+    db: AsyncSession = Depends(get_async_db),
+    user: Identity = Depends(get_current_identity)
 ):
     room = Room(
         status="waiting",
@@ -36,13 +29,12 @@ def create_private_room(
     )
 
     db.add(room)
-    db.commit()
-    db.refresh(room)
+    await db.flush()
 
     # כותבים אותו כשחקן ראשון
     player = RoomPlayer(room_id=room.id, user_id=user.id)
     db.add(player)
-    db.commit()
+    await db.commit()
 
     return {
         "room_id": room.id,
@@ -51,37 +43,38 @@ def create_private_room(
     }
 
 @router.post("/join-invite")
-def join_via_invite(
+async def join_via_invite(
     invite_code: str,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    user: Identity = Depends(get_current_identity)
 ):
-    room = db.query(Room).filter(Room.invite_code == invite_code).first()
+    room = await db.scalar(select(Room).where(Room.invite_code == invite_code))
 
     if not room:
         raise HTTPException(404, "Invalid invite code")
 
     # בדיקה אם יש כבר שני שחקנים
-    count = db.query(RoomPlayer).filter(RoomPlayer.room_id == room.id).count()
+    count = await db.scalar(
+        select(func.count(RoomPlayer.id)).where(RoomPlayer.room_id == room.id)
+    )
     if count >= 2:
         raise HTTPException(400, "Room is full")
 
     # בדיקה אם השחקן כבר בפנים
-    exists = db.query(RoomPlayer).filter(
+    exists = await db.scalar(select(RoomPlayer).where(
         and_(RoomPlayer.user_id == user.id, RoomPlayer.room_id == room.id)
-    ).first()
+    ))
 
     if exists:
         return {"room_id": room.id, "message": "Already in room"}
 
     player = RoomPlayer(room_id=room.id, user_id=user.id)
     db.add(player)
-    db.commit()
 
     # כשיש שניים — עוברים לשחק
     if count + 1 == 2:
         room.status = "playing"
-        db.commit()
+    await db.commit()
 
     return {
         "room_id": room.id,
@@ -90,55 +83,27 @@ def join_via_invite(
     }
 
 @router.post("/find-match")
-def find_match(
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+async def find_match(
+    db: AsyncSession = Depends(get_async_db),
+    user: CachedUser = Depends(get_current_user)
 ):
     print("\n==============================")
     print(f"FIND-MATCH CALLED BY USER {user.id}")
     print("==============================")
 
-    # ---------------------------------------------------
-    # (A) ניקוי חדרים ריקים לפני כל פעולה
-    # ---------------------------------------------------
-    empty_rooms = (
-        db.query(Room)
-        .join(RoomPlayer)
-        .filter(Room.status.in_(["waiting", "playing"]))
-        .group_by(Room.id)
-        .having(
-            func.sum(
-                case((RoomPlayer.connected == True, 1), else_=0)
-            ) == 0
-        )
-        .all()
-    )
-
-    for r in empty_rooms:
-        print(f"[CLEAN] Removing empty room {r.id}")
-
-        # מחיקת ה-ActiveProblems
-        db.query(ActiveProblem).filter(ActiveProblem.room_id == r.id).delete()
-
-        # מחיקת players
-        db.query(RoomPlayer).filter(RoomPlayer.room_id == r.id).delete()
-
-        # מחיקת החדר עצמו
-        db.delete(r)
-
-    db.commit()
+    # abandoned rooms are removed by the background room reaper
+    # (app/services/room_reaper.py), not inside this request
 
     # ---------------------------------------------------
     # (B) בדיקת האם המשתמש כבר בחדר תקין
     # ---------------------------------------------------
-    existing = (
-        db.query(RoomPlayer)
+    existing = await db.scalar(
+        select(RoomPlayer)
         .join(Room)
-        .filter(
+        .where(
             RoomPlayer.user_id == user.id,
             Room.status.in_(["waiting", "playing"])
         )
-        .first()
     )
 
     if existing:
@@ -149,54 +114,9 @@ def find_match(
         }
 
     # ---------------------------------------------------
-    # (C) מציאת חדר שמחכה לשחקן שני
-    # ---------------------------------------------------
-    waiting_room = (
-        db.query(Room)
-        .join(RoomPlayer)
-        .filter(Room.status == "waiting")
-        .group_by(Room.id)
-        .having(func.count(RoomPlayer.id) == 1)
-        .first()
-    )
-
-    if waiting_room:
-        print(f"[MATCH] Room {waiting_room.id} has 1 player → adding user {user.id}")
-
-        rp = RoomPlayer(room_id=waiting_room.id, user_id=user.id, connected=False)
-        db.add(rp)
-
-        waiting_room.status = "playing"
-        db.commit()
-
-        print(f"[START] Room {waiting_room.id} is now PLAYING with users:")
-        players = db.query(RoomPlayer).filter(RoomPlayer.room_id == waiting_room.id).all()
-        for p in players:
-            print(f"   - user {p.user_id}, connected={p.connected}")
-
-        return {
-            "room_id": waiting_room.id,
-            "message": "Match found! Game starting."
-        }
-
-    # ---------------------------------------------------
-    # (D) יצירת חדר חדש
+    # (C) תור matchmaking – זיווג עם שחקן שמחכה, או חדר המתנה חדש
     # ---------------------------------------------------
-    print(f"[NEW] No available room → creating new room for user {user.id}")
-
-    room = Room(status="waiting")
-    db.add(room)
-    db.commit()
-    db.refresh(room)
-
-    rp = RoomPlayer(room_id=room.id, user_id=user.id, connected=False)
-    db.add(rp)
-    db.commit()
-
-    print(f"[NEW ROOM] Created room {room.id} with first player {user.id}")
-
-    return {
-        "room_id": room.id,
-        "message": "New room created. Waiting for opponent."
-    }
+    # no DB connection is held while waiting in the queue
+    await db.commit()
 
+    return await matchmaker.find_match(user.id, user.score)
@@ -1,6 +1,15 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
 from app.services.piston import run_code
+from app.services.executor import get_executor
+from app.services.verdict_cache import verdict_cache
+from app.services.connection_manager import manager
+from app.services.matchmaking import matchmaker
+from app.services.room_reaper import room_reaper
+from app.services.auth_cache import auth_cache
+from app.services.password_hasher import password_hasher
+from app.services.leaderboard import leaderboard
+from app.services.problem_catalog import problem_catalog
 
 router = APIRouter(prefix="/test", tags=["test"])
 
@@ -16,3 +25,50 @@ async def test_piston(req: PistonTestRequest):
         "stdout": stdout,
         "stderr": stderr
     }
+
+
+@router.get("/executor/stats")
+def executor_stats():
+    # e.g. queue depth / recycled workers of the warm pool
+    return get_executor().stats()
+
+
+@router.get("/verdict-cache/stats")
+def verdict_cache_stats():
+    return verdict_cache.stats()
+
+
+@router.get("/ws/stats")
+def ws_stats():
+    # per-room send latency and dropped slow clients of this worker
+    return manager.stats()
+
+
+@router.get("/matchmaking/stats")
+def matchmaking_stats():
+    return matchmaker.stats()
+
+
+@router.get("/reaper/stats")
+def reaper_stats():
+    return room_reaper.stats()
+
+
+@router.get("/auth-cache/stats")
+def auth_cache_stats():
+    return auth_cache.stats()
+
+
+@router.get("/password-hasher/stats")
+def password_hasher_stats():
+    return password_hasher.stats()
+
+
+@router.get("/leaderboard/stats")
+def leaderboard_stats():
+    return leaderboard.stats()
+
+
+@router.get("/problem-catalog/stats")
+def problem_catalog_stats():
+    return problem_catalog.stats()
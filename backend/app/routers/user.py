@@ -1,38 +1,148 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.database import SessionLocal
+import base64
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import LEADERBOARD_MAX_AGE, MATCHES_PAGE_SIZE
+from app.database import get_async_db
 from app.models.user import User
 from app.models.UserSeenProblem import UserSeenProblem
 from app.models.problem import Problem
 from app.models.UserMatch import UserMatch
+from app.services.leaderboard import leaderboard
+from app.services.user_stats import get_stats
 
 router = APIRouter(prefix="/users", tags=["users"])
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+
+
+# -------------------------
+# Leaderboard (in memory, see app/services/leaderboard.py)
+# -------------------------
+def _not_modified(request: Request, response: Response) -> Response | None:
+    # the most polled endpoints – clients revalidate with If-None-Match
+    headers = {
+        "ETag": leaderboard.etag,
+        "Cache-Control": f"public, max-age={LEADERBOARD_MAX_AGE}",
+    }
+    if leaderboard.etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
 @router.get("/top10")
-def get_top_users(db: Session = Depends(get_db)):
-    top_users = db.query(User).order_by(User.score.desc()).limit(10).all()
-    return [{"username": user.username, "score": user.score} for user in top_users]        
+async def get_top_users(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    await leaderboard.ensure_loaded(db)
+    not_modified = _not_modified(request, response)
+    if not_modified:
+        return not_modified
+    return [{"username": e["username"], "score": e["score"]} for e in leaderboard.page(0, 10)]
+
+
+@router.get("/leaderboard")
+async def get_leaderboard(
+    request: Request,
+    response: Response,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    await leaderboard.ensure_loaded(db)
+    not_modified = _not_modified(request, response)
+    if not_modified:
+        return not_modified
+    return {"total": len(leaderboard), "entries": leaderboard.page(offset, limit)}
+
+
+@router.get("/{user_id}/rank")
+async def get_rank(
+    user_id: int,
+    request: Request,
+    response: Response,
+    neighbours: int = Query(2, ge=0, le=50),
+    db: AsyncSession = Depends(get_async_db)
+):
+    await leaderboard.ensure_loaded(db)
+    if leaderboard.rank(user_id) is None:
+        # registered on another worker since the last reload
+        user = await db.get(User, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        leaderboard.set_score(user.id, user.username, user.score)
+
+    not_modified = _not_modified(request, response)
+    if not_modified:
+        return not_modified
+    return leaderboard.around(user_id, neighbours)
+
 
 @router.get("/{user_id}/seen_problems")
-def get_seen_problems(user_id: int, db: Session = Depends(get_db)):
-    seen = (
-        db.query(UserSeenProblem, Problem)
+async def get_seen_problems(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    seen = (await db.execute(
+        select(UserSeenProblem, Problem)
           .join(Problem, Problem.id == UserSeenProblem.problem_id)
-          .filter(UserSeenProblem.user_id == user_id)
-          .all()
-    )
+          .where(UserSeenProblem.user_id == user_id)
+    )).all()
     return [
         {"problem_id": p.id, "title": p.title, "language": p.language}
         for _, p in seen
     ]
+# -------------------------
+# Match history (keyset pages)
+# -------------------------
+def _encode_cursor(match: UserMatch) -> str:
+    raw = f"{match.created_at.isoformat()}|{match.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, match_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(match_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/{user_id}/matches")
-def get_matches(user_id: int, db: Session = Depends(get_db)):
-    matches = db.query(UserMatch).filter_by(user_id=user_id).order_by(UserMatch.created_at.desc()).all()
+async def get_matches(
+    user_id: int,
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(MATCHES_PAGE_SIZE, ge=1, le=200),
+    compact: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Newest first, `limit` per page. When there are more, the X-Next-Cursor
+    header holds the `cursor` of the next page. `compact=true` returns rows
+    as [room_id, opponent, winner, rounds_won, rounds_lost, created_at].
+    """
+    query = (
+        select(UserMatch)
+        .where(UserMatch.user_id == user_id)
+        .order_by(UserMatch.created_at.desc(), UserMatch.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        # keyset: rows strictly after the cursor row – served by
+        # ix_user_matches_user_created_id whatever the page number
+        created_at, match_id = _decode_cursor(cursor)
+        query = query.where(or_(
+            UserMatch.created_at < created_at,
+            and_(UserMatch.created_at == created_at, UserMatch.id < match_id)
+        ))
+
+    matches = (await db.execute(query)).scalars().all()
+    if len(matches) > limit:
+        matches = matches[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(matches[-1])
+
+    if compact:
+        return [
+            [m.room_id, m.opponent_name, m.winner, m.rounds_won, m.rounds_lost, m.created_at]
+            for m in matches
+        ]
     return [ {
         "opponent": m.opponent_name,
         "winner": m.winner,
@@ -41,3 +151,9 @@ def get_matches(user_id: int, db: Session = Depends(get_db)):
         "room_id": m.room_id,
         "created_at": m.created_at
     } for m in matches ]
+
+
+@router.get("/{user_id}/stats")
+async def get_user_stats(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    # totals kept up to date by finish_room – no scan of the history
+    return await get_stats(db, user_id)
@@ -1,286 +1,237 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from sqlalchemy.orm import Session
-from jose import jwt
-import json, random
-import ast
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from sqlalchemy import select, update, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+import json
 
-from app.database import SessionLocal
+from app.database import AsyncSessionLocal
 from app.models.room import Room
 from app.models.room_player import RoomPlayer
-from app.models.active_problem import ActiveProblem
-from app.models.UserSeenProblem import UserSeenProblem
-from app.models.problem import Problem
 from app.models.user import User
 from app.models.UserMatch import UserMatch
 from app.services.verify import verify_solution
-
-from app.config import SECRET_KEY
+from app.services.executor import TRANSIENT_ERRORS
+from app.services.connection_manager import manager, ROOM_ELSEWHERE_CLOSE_CODE
+from app.services.room_engine import room_engine, RoomState
+from app.services.write_behind import write_behind
+from app.services.auth_cache import auth_cache
+from app.services.leaderboard import leaderboard
+from app.services.user_stats import record_match
+from app.security import decode_token
 
 router = APIRouter(prefix="/ws", tags=["websocket"])
 
 
 # ====================================================
-# Connection Manager
+# DB Helpers
 # ====================================================
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: dict[int, list[WebSocket]] = {}
-        self.next_round_votes: dict[int, set[int]] = {}
-
-    async def connect(self, room_id: int, ws: WebSocket):
-        self.active_connections.setdefault(room_id, [])
-        self.active_connections[room_id].append(ws)
-
-    def disconnect(self, room_id: int, ws: WebSocket):
-        try:
-            self.active_connections[room_id].remove(ws)
-        except:
-            pass
-
-    async def send(self, ws: WebSocket, message: dict):
-        try:
-            await ws.send_text(json.dumps(message))
-        except:
-            pass
-
-    async def broadcast(self, room_id: int, message: dict):
-        conns = self.active_connections.get(room_id, [])
-        for ws in conns:
-            await self.send(ws, message)
+# Every DB step below runs on the async engine in its own short session, so a
+# query never blocks the event loop (and the other sockets on this worker)
+# and no pooled connection is held while a socket waits for messages.
 
-    async def broadcast_except(self, room_id: int, message: dict, except_ws: WebSocket):
-        conns = self.active_connections.get(room_id, [])
-        for ws in conns:
-            if ws is not except_ws:
-                await self.send(ws, message)
-
-
-manager = ConnectionManager()
+async def set_connected(db: AsyncSession, rp_id: int, connected: bool):
+    await db.execute(
+        update(RoomPlayer).where(RoomPlayer.id == rp_id).values(connected=connected)
+    )
 
 
-# ====================================================
-# DB Helper
-# ====================================================
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+async def claim_room_finish(db: AsyncSession, room_id: int, force: bool) -> bool:
+    """
+    Mark the room finished. Unless `force`, only a room that is not finished
+    yet is claimed – one conditional UPDATE, so when both players leave at
+    once only one of them computes the result.
+    """
+    query = update(Room).where(Room.id == room_id)
+    if not force:
+        query = query.where(Room.status != "finished")
+    claimed = await db.scalar(query.values(status="finished").returning(Room.id))
+    return claimed is not None
 
 
 # ====================================================
-# Start new round
+# FINISH ROOM — compute winner & update personal score
 # ====================================================
-def start_new_round(db: Session, room: Room):
-    # שליפת שני השחקנים
-    players = db.query(RoomPlayer).filter(
-        RoomPlayer.room_id == room.id
-    ).all()
-
-    if len(players) != 2:
-        raise Exception("Room must have exactly 2 players to start a round.")
-
-    p1, p2 = players
-    p1_id = p1.user_id
-    p2_id = p2.user_id
-
-    # אילו שאלות השחקנים כבר ראו
-    seen_p1 = db.query(UserSeenProblem.problem_id).filter(
-        UserSeenProblem.user_id == p1_id
-    )
-
-    seen_p2 = db.query(UserSeenProblem.problem_id).filter(
-        UserSeenProblem.user_id == p2_id
-    )
-
-    # סינון: בעיות שאף אחד מהם לא ראה
-    available_problems = db.query(Problem).filter(
-        Problem.id.not_in(seen_p1),
-        Problem.id.not_in(seen_p2)
-    ).all()
-
-    # אם אין בעיות חדשות → fallback: אפשר להחזיר את כל הבעיות מחדש
-    if not available_problems:
-        print("[ROUND] no new problems available for both players, resetting seen problems.")
-        available_problems = db.query(Problem).all()
-
-    # בחר בעיה
-    problem = random.choice(available_problems)
-
-    # עדכון ActiveProblem
-    active = ActiveProblem(
-        room_id=room.id,
-        problem_id=problem.id,
-        round_number=room.current_round + 1,
-        winner_user_id=None
-    )
-
-    room.current_round += 1
+async def finish_room(db: AsyncSession, room_id: int):
+    """
+    Result of the room, written in the caller's transaction: one joined
+    read of both players, an atomic score increment and a bulk insert of
+    the two match records.
+    """
+    rows = (await db.execute(
+        select(RoomPlayer.user_id, RoomPlayer.score_in_room, User.username, User.score)
+        .join(User, User.id == RoomPlayer.user_id)
+        .where(RoomPlayer.room_id == room_id)
+        .order_by(RoomPlayer.id)
+    )).all()
+
+    if len(rows) != 2:
+        return
 
-    db.add(active)
+    p1, p2 = rows
+    p1_rounds, p2_rounds = p1.score_in_room or 0, p2.score_in_room or 0
+    scores = {p1.user_id: p1.score or 0, p2.user_id: p2.score or 0}
 
-    # סימון שהבעיה נראתה על ידי שני השחקנים
-    for rp in players:
-        exists = db.query(UserSeenProblem).filter_by(
-            user_id=rp.user_id,
-            problem_id=problem.id
-        ).first()
+    # Determine winner
+    if p1_rounds > p2_rounds:
+        winner, winner_name = p1.user_id, p1.username
+    elif p2_rounds > p1_rounds:
+        winner, winner_name = p2.user_id, p2.username
+    else:
+        winner, winner_name = None, None
 
-        if not exists:
-            db.add(UserSeenProblem(user_id=rp.user_id, problem_id=problem.id))
+    # Personal score update – atomic, no read-modify-write of the row
+    if winner:
+        scores[winner] = await db.scalar(
+            update(User)
+            .where(User.id == winner)
+            .values(score=User.score + 1)
+            .returning(User.score)
+        )
+
+    # Match history of both players, one INSERT
+    await db.execute(insert(UserMatch), [
+        {
+            "user_id": me.user_id,
+            "opponent_name": other.username,
+            "winner": winner == me.user_id,
+            "rounds_won": won,
+            "rounds_lost": lost,
+            "room_id": room_id,
+        }
+        for me, other, won, lost in (
+            (p1, p2, p1_rounds, p2_rounds),
+            (p2, p1, p2_rounds, p1_rounds),
+        )
+    ])
+    await record_match(db, p1.user_id, winner == p1.user_id, p1_rounds, p2_rounds)
+    await record_match(db, p2.user_id, winner == p2.user_id, p2_rounds, p1_rounds)
 
-    db.commit()
-    db.refresh(active)
+    result_msg = {
+        "event": "room_result",
+        "winner": winner,
+        "p1_score": p1_rounds,
+        "p2_score": p2_rounds,
+        "personalScores": scores,
+        "winner_name": winner_name
+    }
 
-    print(f"[ROUND] new round {active.round_number} in room {room.id}")
+    return result_msg
 
-    return active, problem
 
+async def close_room_in_db(rp_id: int, room_id: int, finish: bool):
+    """
+    Player left: mark them disconnected and, if the room is still running
+    (or `finish` forces it), compute the result and mark the room finished –
+    all in one transaction. Returns the room_result message, if any.
+    """
+    # scores / rounds of the room are applied in memory first – persist them
+    await write_behind.flush()
 
-def normalize(code: str):
-    try:
-        tree = ast.parse(code)
-        return ast.dump(tree, annotate_fields=False, include_attributes=False)
-    except Exception:
-        return None  # קוד לא תקין – אי אפשר לפרסר
+    async with AsyncSessionLocal() as db:
+        await set_connected(db, rp_id, False)
 
+        result = None
+        if await claim_room_finish(db, room_id, force=finish):
+            result = await finish_room(db, room_id)
+        await db.commit()
 
-# ====================================================
-# Cleanup if empty
-# ====================================================
-def cleanup_room_if_empty(db: Session, room_id: int):
-    connected = db.query(RoomPlayer).filter(
-        RoomPlayer.room_id == room_id,
-        RoomPlayer.connected == True
-    ).count()
-
-    if connected == 0:
-        room = db.query(Room).filter(Room.id == room_id).first()
-        if room:
-            room.status = "waiting"
-            room.current_round = 0
-            db.query(ActiveProblem).filter(
-                ActiveProblem.room_id == room_id
-            ).delete()
-            db.commit()
-            print(f"[CLEANUP] Room {room_id} reset: empty")
+    if result and result["winner"]:
+        winner = result["winner"]
+        auth_cache.invalidate_user(winner)
+        leaderboard.set_score(winner, result["winner_name"], result["personalScores"][winner])
+    return result
 
 
 # ====================================================
-# FINISH ROOM — compute winner & update personal score
+# Close all clients in room
 # ====================================================
-def finish_room(db: Session, room_id: int):
-    room = db.query(Room).filter(Room.id == room_id).first()
-    if not room:
-        return
+async def force_close_room(room_id: int):
+    await manager.close_room(room_id)
+    room_engine.evict(room_id)
+    await manager.release_room(room_id)
 
-    players = db.query(RoomPlayer).filter(
-        RoomPlayer.room_id == room_id
-    ).all()
 
-    if len(players) != 2:
-        return
+def solution_message(rnd):
+    return {
+        "event": "solution_result",
+        "correct": True,
+        "winner_name": rnd.winner_name,
+        "fixed_code": rnd.problem.fixed_code
+    }
 
-    p1, p2 = players
 
-    # Determine winner
-    if p1.score_in_room > p2.score_in_room:
-        winner = p1.user_id
-    elif p2.score_in_room > p1.score_in_room:
-        winner = p2.user_id
-    else:
-        winner = None
-    winner_name = None
-    if winner:
-        winner_user = db.query(User).filter(User.id == winner).first()
-        winner_name = winner_user.username
-    # Personal score update
-    if winner:
-        user = db.query(User).filter(User.id == winner).first()
-        user.score += 1
-        db.commit()
-    u1  = get_user_by_id(db, p1.user_id)
-    u2  = get_user_by_id(db, p2.user_id)
-    # For p1
-    save_match_record(
-        db, 
-        p1.user_id,
-        opponent_name=u2.username,
-        winner=(winner == p1.user_id),
-        rounds_won=p1.score_in_room,
-        rounds_lost=p2.score_in_room,
-        room_id=room_id
-    )
+def closed_round_message(rnd, problem_id):
+    """Answer to a submission for a round that is not open (any more)."""
+    if rnd is not None and rnd.winner_user_id is not None and rnd.problem.id == problem_id:
+        # decided already – the same result the room got
+        return solution_message(rnd)
+    return {
+        "event": "solution_result",
+        "correct": False,
+        "error": "This round is not open"
+    }
 
-    # For p2
-    save_match_record(
-        db, 
-        p2.user_id,
-        opponent_name=u1.username,
-        winner=(winner == p2.user_id),
-        rounds_won=p2.score_in_room,
-        rounds_lost=p1.score_in_room,
-        room_id=room_id
-    )
-    
 
-    result_msg = {
-        "event": "room_result",
-        "winner": winner,
-        "p1_score": p1.score_in_room,
-        "p2_score": p2.score_in_room,
-        "personalScores": {
-            p1.user_id: db.query(User).filter(User.id == p1.user_id).first().score,
-            p2.user_id: db.query(User).filter(User.id == p2.user_id).first().score
-        },
-        "winner_name": winner_name
+def round_start_message(active, problem, with_description=True):
+    message = {
+        "event": "round_start",
+        "problem": {
+            "id": problem.id,
+            "title": problem.title,
+            "description": problem.description,
+            "language": problem.language,
+            "code_with_bug": problem.code_with_bug,
+            "round": active.round_number
+        }
     }
-
-    return result_msg
-def mark_problem_seen(db, user_id, problem_id):
-    exists = db.query(UserSeenProblem).filter_by(
-        user_id=user_id, problem_id=problem_id
-    ).first()
-
-    if not exists:
-        record = UserSeenProblem(user_id=user_id, problem_id=problem_id)
-        db.add(record)
-        db.commit()
-
-def save_match_record(db, user_id, opponent_name, winner, rounds_won, rounds_lost, room_id):
-    record = UserMatch(
-        user_id=user_id,
-        opponent_name=opponent_name,
-        winner=winner,
-        rounds_won=rounds_won,
-        rounds_lost=rounds_lost,
-        room_id=room_id
-    )
-    db.add(record)
-    db.commit()
-def get_user_by_id(db, user_id):
-    return db.query(User).filter(User.id == user_id).first()
+    if not with_description:
+        del message["problem"]["description"]
+    return message
 
 
 # ====================================================
-# Close all clients in room
+# Submission of a room player
 # ====================================================
-async def force_close_room(room_id: int):
-    conns = manager.active_connections.get(room_id, [])
-    for ws in conns:
-        try:
-            await ws.close()
-        except:
-            pass
-    manager.active_connections[room_id] = []
+async def submit_solution(ws: WebSocket, state: RoomState, user_id: int, problem_id: int, submitted: str):
+    """
+    Verify a submission for the room's open round and answer it; the first
+    correct one claims the round and is broadcast to the room. Every
+    submission gets a solution_result.
+    """
+    room_id = state.room_id
+
+    rnd = room_engine.open_round(room_id, problem_id)
+    if not rnd:
+        # the client waits for a solution_result either way
+        await manager.send(ws, closed_round_message(state.round, problem_id), room_id)
+        return
+
+    is_correct, out, expected, stderr = await verify_solution(submitted, rnd.problem)
+
+    if is_correct:
+        if room_engine.claim_winner(room_id, rnd, user_id):
+            await manager.broadcast(room_id, solution_message(rnd))
+        elif rnd.winner_user_id is not None:
+            # the opponent claimed the round first – same result
+            # the room already got, straight from memory
+            await manager.send(ws, solution_message(rnd), room_id)
+        else:
+            # the round was superseded or the room evicted while
+            # the solution was verified
+            await manager.send(ws, closed_round_message(state.round, problem_id), room_id)
+
+    else:
+        message = {"event": "solution_result", "correct": False}
+        if stderr in TRANSIENT_ERRORS:
+            # the executor could not run it – not a wrong answer
+            message["error"] = stderr
+        await manager.send(ws, message, room_id)
 
 
 # ====================================================
 # WebSocket
 # ====================================================
 @router.websocket("/rooms/{room_id}")
-async def room_socket(ws: WebSocket, room_id: int, db: Session = Depends(get_db)):
+async def room_socket(ws: WebSocket, room_id: int):
 
     # -------------------------
     # AUTH
@@ -290,49 +241,44 @@ async def room_socket(ws: WebSocket, room_id: int, db: Session = Depends(get_db)
         return
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        user_id = int(payload["sub"])
-    except:
+        user_id = int(decode_token(token)["sub"])
+    except HTTPException:
         return
 
-    user = db.query(User).filter(User.id == user_id).first()
-    room = db.query(Room).filter(Room.id == room_id).first()
-
-    if not user or not room:
+    # room, players and current round come from the room engine
+    state = await room_engine.join(room_id, user_id)
+    if not state:
+        await ws.close()
         return
 
-    rp = db.query(RoomPlayer).filter(
-        RoomPlayer.room_id == room_id,
-        RoomPlayer.user_id == user_id
-    ).first()
-
-    if not rp:
-        await ws.close()
+    # the room's live state is owned by one worker (see backplane.py); a
+    # socket that lands on another is refused and the client reconnects
+    if not await manager.claim_room(room_id):
+        room_engine.evict(room_id)
+        await ws.accept()
+        await ws.close(code=ROOM_ELSEWHERE_CLOSE_CODE)
         return
 
+    user = state.players[user_id]
+    rp_id = user.rp_id
+
     # -------------------------
     # ACCEPT & REGISTER
     # -------------------------
     await ws.accept()
     await manager.connect(room_id, ws)
-
-    rp.connected = True
-    db.commit()
+    room_engine.connect(state, user_id)
 
     print(f"[WS] user {user_id} connected to room {room_id}")
 
     # If opponent exists – notify both
-    other = db.query(RoomPlayer).filter(
-        RoomPlayer.room_id == room_id,
-        RoomPlayer.user_id != user_id
-    ).first()
+    other = state.other_player(user_id)
 
     if other:
-        other_user = db.query(User).filter(User.id == other.user_id).first()
         await manager.send(ws, {
             "event": "opponent_join",
-            "username": other_user.username
-        })
+            "username": other.username
+        }, room_id)
 
     await manager.broadcast_except(room_id, {
         "event": "opponent_join",
@@ -340,29 +286,10 @@ async def room_socket(ws: WebSocket, room_id: int, db: Session = Depends(get_db)
     }, ws)
 
     # Start round if 2 connected
-    connected_now = db.query(RoomPlayer).filter(
-        RoomPlayer.room_id == room_id,
-        RoomPlayer.connected == True
-    ).count()
-
-    if connected_now == 2 and room.current_round == 0:
-        active, problem = start_new_round(db, room)
-        players = db.query(RoomPlayer).filter(
-        RoomPlayer.room_id == room_id
-        ).all()
-        for rp in players:
-            mark_problem_seen(db, rp.user_id, problem.id)
-        await manager.broadcast(room_id, {
-            "event": "round_start",
-            "problem": {
-                "id": problem.id,
-                "title": problem.title,
-                "description": problem.description,
-                "language": problem.language,
-                "code_with_bug": problem.code_with_bug,
-                "round": active.round_number
-            }
-        })
+    if state.connected_count() == 2 and state.current_round == 0:
+        rnd = await room_engine.start_round(room_id, after_round=0)
+        if rnd:
+            await manager.broadcast(room_id, round_start_message(rnd, rnd.problem))
 
     # -------------------------
     # MAIN LOOP
@@ -378,50 +305,19 @@ async def room_socket(ws: WebSocket, room_id: int, db: Session = Depends(get_db)
             # ========================================
             if event == "submit_solution":
 
-                problem_id = data["problem_id"]
-                submitted = data["solution"].strip()
-
-                active = db.query(ActiveProblem).filter(
-                    ActiveProblem.room_id == room_id,
-                    ActiveProblem.problem_id == problem_id,
-                    ActiveProblem.winner_user_id == None
-                ).first()
-
-                if not active:
-                    continue
-
-                problem = db.query(Problem).filter(Problem.id == problem_id).first()
-                is_correct, out, expected, stderr = await verify_solution(submitted, problem)
-
-                if is_correct:
-                    active.winner_user_id = user_id
-                    rp.score_in_room += 1
-                    db.commit()
-
-                    await manager.broadcast(room_id, {
-                        "event": "solution_result",
-                        "correct": True,
-                        "winner_name": user.username,
-                        "fixed_code": problem.fixed_code
-                    })
-
-                else:
-                    await ws.send_text(json.dumps({
-                        "event": "solution_result",
-                        "correct": False
-                    }))
+                await submit_solution(ws, state, user_id, data["problem_id"],
+                                      data["solution"].strip())
 
             # ========================================
             # NEXT ROUND REQUEST
             # ========================================
             elif event == "next_round_request":
 
-                votes = manager.next_round_votes.setdefault(room_id, set())
-                votes.add(user_id)
+                await manager.add_vote(room_id, user_id)
 
-                await ws.send_text(json.dumps({
+                await manager.send(ws, {
                     "event": "next_round_wait"
-                }))
+                }, room_id)
 
                 await manager.broadcast_except(room_id, {
                     "event": "next_round_request",
@@ -433,35 +329,27 @@ async def room_socket(ws: WebSocket, room_id: int, db: Session = Depends(get_db)
             # ========================================
             elif event == "next_round_accept":
 
-                votes = manager.next_round_votes.setdefault(room_id, set())
-                votes.add(user_id)
+                votes = await manager.add_vote(room_id, user_id)
 
-                if len(votes) == 2:
-                    votes.clear()
-                    active, problem = start_new_round(db, room)
+                if votes == 2:
+                    await manager.clear_votes(room_id)
+                    rnd = await room_engine.start_round(room_id, state.current_round)
 
-                    await manager.broadcast(room_id, {
-                        "event": "round_start",
-                        "problem": {
-                            "id": problem.id,
-                            "title": problem.title,
-                            "language": problem.language,
-                            "code_with_bug": problem.code_with_bug,
-                            "round": active.round_number
-                        }
-                    })
+                    if rnd:
+                        await manager.broadcast(
+                            room_id, round_start_message(rnd, rnd.problem, with_description=False)
+                        )
 
             # ========================================
             # NEXT ROUND DECLINE  — CLOSE ROOM
             # ========================================
             elif event == "next_round_decline":
 
-                rp.connected = False
-                db.commit()
-                manager.disconnect(room_id, ws)
+                await manager.disconnect(room_id, ws)
+                room_engine.leave(room_id, user_id)
 
                 # 1) Finish room & announce winner
-                result = finish_room(db, room_id)
+                result = await close_room_in_db(rp_id, room_id, finish=True)
                 if result:
                     await manager.broadcast(room_id, result)
 
@@ -474,13 +362,10 @@ async def room_socket(ws: WebSocket, room_id: int, db: Session = Depends(get_db)
                 # 3) Close entire room
                 await force_close_room(room_id)
 
-                room.status = "finished"
-                db.commit()
-
                 # 4) Notify declining player
-                await ws.send_text(json.dumps({
+                await manager.send(ws, {
                     "event": "you_declined_and_left"
-                }))
+                })
 
                 break
 
@@ -489,14 +374,10 @@ async def room_socket(ws: WebSocket, room_id: int, db: Session = Depends(get_db)
             # ========================================
             elif event == "exit_room":
 
-                rp.connected = False
-                db.commit()
-                if room.status != "finished":
-                    result = finish_room(db, room_id)
-                    if result:
-                        await manager.broadcast(room_id, result)
-                    room.status = "finished"
-                    db.commit()    
+                room_engine.leave(room_id, user_id)
+                result = await close_room_in_db(rp_id, room_id, finish=False)
+                if result:
+                    await manager.broadcast(room_id, result)
 
                 await manager.broadcast_except(room_id, {
                     "event": "opponent_left",
@@ -504,9 +385,6 @@ async def room_socket(ws: WebSocket, room_id: int, db: Session = Depends(get_db)
                 }, ws)
 
                 await force_close_room(room_id)
-
-                room.status = "finished"
-                db.commit()
                 break
 
     # =====================================================
@@ -514,19 +392,14 @@ async def room_socket(ws: WebSocket, room_id: int, db: Session = Depends(get_db)
     # =====================================================
     except WebSocketDisconnect:
 
-        manager.next_round_votes.setdefault(room_id, set()).discard(user_id)
-
-        rp.connected = False
-        db.commit()
-        manager.disconnect(room_id, ws)
+        await manager.remove_vote(room_id, user_id)
+        await manager.disconnect(room_id, ws)
+        room_engine.leave(room_id, user_id)
 
         # 1) winner calculation
-        if room.status != "finished":
-            result = finish_room(db, room_id)
-            if result:
-                await manager.broadcast(room_id, result)
-            room.status = "finished"
-            db.commit()
+        result = await close_room_in_db(rp_id, room_id, finish=False)
+        if result:
+            await manager.broadcast(room_id, result)
 
         # 2) notify the other player
         await manager.broadcast(room_id, {
@@ -537,7 +410,4 @@ async def room_socket(ws: WebSocket, room_id: int, db: Session = Depends(get_db)
         # 3) close room entirely
         await force_close_room(room_id)
 
-        room.status = "finished"
-        db.commit()
-
         print(f"[WS] user {user_id} disconnected from room {room_id}")
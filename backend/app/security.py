@@ -3,31 +3,18 @@ from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import SessionLocal
+from app.database import get_async_db
 from app.models.user import User
-from app.config import SECRET_KEY, ALGORITHM
+from app.config import SECRET_KEY, ALGORITHM, AUTH_TRUST_TOKEN_CLAIMS
+from app.services.auth_cache import auth_cache, CachedUser, Identity
 
 # -------------------------------------
 # JWT
 # -------------------------------------
 ACCESS_TOKEN_EXPIRE_MINUTES = 12 
 
-# -------------------------------------
-# bcrypt
-# -------------------------------------
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def hash_password(password: str):
-    return pwd_context.hash(password)
-
-def verify_password(password: str, hashed_password: str):
-    return pwd_context.verify(password, hashed_password)
-
-# -------------------------------------
-# JWT
-# -------------------------------------
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -35,43 +22,64 @@ def create_access_token(data: dict):
 
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-# -------------------------------------
-# DB dependency
-# -------------------------------------
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # -------------------------------------
 # -------------------------------------
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 # -------------------------------------
 # Get current user from token
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db=Depends(get_db)
-):
+# -------------------------------------
+def decode_token(token: str) -> dict:
+    """Verified claims of the token; decoded once per token (auth_cache)."""
+    claims = auth_cache.get_claims(token)
+    if claims is not None:
+        return claims
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
         raise HTTPException(
             status_code=401,
             detail="Invalid or expired token"
         )
 
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    if claims.get("sub") is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    auth_cache.set_claims(token, claims)
+    return claims
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> CachedUser:
+    user_id = int(decode_token(token)["sub"])
+
+    cached = auth_cache.get_user(user_id)
+    if cached is not None:
+        return cached
+
+    user = await db.get(User, user_id)
 
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
 
-    return user
+    return auth_cache.set_user(user)
+
+
+async def get_current_identity(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> Identity:
+    """
+    id / username / is_admin of the caller. With AUTH_TRUST_TOKEN_CLAIMS
+    they come from the signed token (no DB access); older tokens without
+    the claims fall back to get_current_user.
+    """
+    claims = decode_token(token)
+    if AUTH_TRUST_TOKEN_CLAIMS and "username" in claims and "is_admin" in claims:
+        return Identity(int(claims["sub"]), claims["username"], bool(claims["is_admin"]))
+
+    user = await get_current_user(token, db)
+    return Identity(user.id, user.username, user.is_admin)
@@ -0,0 +1,67 @@
+import time
+from typing import NamedTuple
+
+from app.config import AUTH_CACHE_SIZE, AUTH_CLAIMS_TTL, AUTH_USER_TTL
+from app.services.ttl_cache import TTLCache
+
+
+class CachedUser(NamedTuple):
+    """Read-only snapshot of a `User` row, safe to share between requests."""
+    id: int
+    username: str
+    score: int
+    is_admin: bool
+    email: str
+
+    @classmethod
+    def from_row(cls, user) -> "CachedUser":
+        return cls(user.id, user.username, user.score or 0, bool(user.is_admin), user.email)
+
+
+class Identity(NamedTuple):
+    """Who is calling, straight from the signed token claims."""
+    id: int
+    username: str
+    is_admin: bool
+
+
+class AuthCache:
+    """
+    Decoded token claims by token, and user snapshots by id.
+
+    Claims never outlive the token's `exp`. User snapshots are dropped by
+    `invalidate_user` when the score or admin flag of the user changes, and
+    otherwise expire after AUTH_USER_TTL.
+    """
+
+    def __init__(self, maxsize: int = AUTH_CACHE_SIZE,
+                 claims_ttl: float = AUTH_CLAIMS_TTL, user_ttl: float = AUTH_USER_TTL):
+        self._claims = TTLCache(maxsize, claims_ttl)
+        self._users = TTLCache(maxsize, user_ttl)
+
+    def get_claims(self, token: str) -> dict | None:
+        claims = self._claims.get(token)
+        if claims is not None and claims.get("exp", 0) <= time.time():
+            self._claims.pop(token)
+            return None
+        return claims
+
+    def set_claims(self, token: str, claims: dict):
+        self._claims.set(token, claims)
+
+    def get_user(self, user_id: int) -> CachedUser | None:
+        return self._users.get(user_id)
+
+    def set_user(self, user) -> CachedUser:
+        cached = CachedUser.from_row(user)
+        self._users.set(cached.id, cached)
+        return cached
+
+    def invalidate_user(self, user_id: int):
+        self._users.pop(user_id)
+
+    def stats(self) -> dict:
+        return {"claims": self._claims.stats(), "users": self._users.stats()}
+
+
+auth_cache = AuthCache()
@@ -0,0 +1,248 @@
+import asyncio
+import json
+import uuid
+
+from app.config import BACKPLANE, REDIS_URL, BACKPLANE_PREFIX
+
+
+# -------------------------------------
+# Room backplane
+# -------------------------------------
+# A room's two sockets may live on different uvicorn workers (or hosts).
+# Every broadcast is delivered to this worker's sockets directly and
+# published on the backplane; the other workers subscribed to the room
+# deliver it to theirs. Next-round votes live on the backplane too, so both
+# players' votes are counted in one place.
+#
+# The live state of a room (room_engine) is owned by ONE worker: the first
+# to claim it on the backplane. A socket of the room that lands on another
+# worker is refused (ROOM_ELSEWHERE_CLOSE_CODE) and the client reconnects.
+#
+# Envelope published per room:
+#   {"origin": node id, "kind": "message" | "close",
+#    "text": encoded message, "exclude": connection id or null}
+
+
+class Backplane:
+    """Pub/sub between the workers serving the same rooms + shared votes."""
+
+    def __init__(self):
+        self.node_id = uuid.uuid4().hex
+        self._handler = None
+
+    async def start(self, handler):
+        # handler(room_id, envelope) – called for envelopes of other workers
+        self._handler = handler
+
+    async def close(self):
+        pass
+
+    async def subscribe(self, room_id: int):
+        pass
+
+    async def unsubscribe(self, room_id: int):
+        pass
+
+    async def publish(self, room_id: int, envelope: dict):
+        pass
+
+    async def add_vote(self, room_id: int, user_id: int) -> int:
+        """Record the vote and return how many players voted so far."""
+        raise NotImplementedError
+
+    async def remove_vote(self, room_id: int, user_id: int):
+        raise NotImplementedError
+
+    async def clear_votes(self, room_id: int):
+        raise NotImplementedError
+
+    async def claim_room(self, room_id: int) -> bool:
+        """Own the room's live state on this worker; False if another worker does."""
+        return True
+
+    async def release_room(self, room_id: int):
+        pass
+
+
+class InMemoryBackplane(Backplane):
+    """Single worker: every socket is local, nothing to publish, every room ours."""
+
+    def __init__(self):
+        super().__init__()
+        self.votes: dict[int, set[int]] = {}
+
+    async def add_vote(self, room_id, user_id):
+        votes = self.votes.setdefault(room_id, set())
+        votes.add(user_id)
+        return len(votes)
+
+    async def remove_vote(self, room_id, user_id):
+        self.votes.get(room_id, set()).discard(user_id)
+
+    async def clear_votes(self, room_id):
+        self.votes.pop(room_id, None)
+
+
+class RedisBackplane(Backplane):
+    """
+    Redis pub/sub (one channel per room) and a Redis set of votes per room.
+
+    `client` is any `redis.asyncio.Redis`-compatible client – e.g. a
+    `fakeredis.aioredis.FakeRedis` stand-in when testing without a server.
+    """
+
+    # a room that is never cleaned up does not keep its votes forever
+    VOTES_TTL = 3600
+    # a dead worker's rooms can be claimed again after this long; live
+    # owners refresh their claims every OWNER_TTL / 3
+    OWNER_TTL = 30
+
+    def __init__(self, client=None, url: str = REDIS_URL, prefix: str = BACKPLANE_PREFIX):
+        super().__init__()
+        if client is None:
+            import redis.asyncio as redis  # optional dependency, only for BACKPLANE=redis
+            client = redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self._pubsub = None
+        self._reader: asyncio.Task | None = None
+        self._heartbeat: asyncio.Task | None = None
+        self._owned: set[int] = set()
+
+    def _channel(self, room_id: int) -> str:
+        return f"{self.prefix}:room:{room_id}"
+
+    def _votes_key(self, room_id: int) -> str:
+        return f"{self.prefix}:room:{room_id}:votes"
+
+    def _owner_key(self, room_id: int) -> str:
+        return f"{self.prefix}:room:{room_id}:owner"
+
+    async def start(self, handler):
+        await super().start(handler)
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._reader = asyncio.create_task(self._read())
+        self._heartbeat = asyncio.create_task(self._keep_owned())
+
+    async def close(self):
+        for task in (self._reader, self._heartbeat):
+            if task:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._reader = self._heartbeat = None
+        # hand our rooms over right away instead of after OWNER_TTL
+        for room_id in list(self._owned):
+            try:
+                await self.release_room(room_id)
+            except Exception as e:
+                print(f"[BACKPLANE] release of room {room_id} failed: {e!r}")
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        await self.client.aclose()
+
+    async def subscribe(self, room_id):
+        await self._pubsub.subscribe(self._channel(room_id))
+
+    async def unsubscribe(self, room_id):
+        await self._pubsub.unsubscribe(self._channel(room_id))
+
+    async def publish(self, room_id, envelope):
+        envelope = {**envelope, "origin": self.node_id}
+        await self.client.publish(self._channel(room_id), json.dumps(envelope))
+
+    async def _read(self):
+        while True:
+            try:
+                if not self._pubsub.subscribed:
+                    # nothing to listen to until the first socket connects
+                    await asyncio.sleep(0.05)
+                    continue
+                msg = await self._pubsub.get_message(timeout=1.0)
+                if msg is None or msg["type"] != "message":
+                    continue
+
+                envelope = json.loads(msg["data"])
+                if envelope.get("origin") == self.node_id:
+                    continue  # already delivered locally
+
+                channel = msg["channel"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                room_id = int(channel.rsplit(":", 1)[1])
+                await self._handler(room_id, envelope)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # a bad envelope or a dropped Redis connection must not kill the reader
+                print(f"[BACKPLANE] read failed: {e!r}")
+                await asyncio.sleep(1)
+
+    async def add_vote(self, room_id, user_id):
+        key = self._votes_key(room_id)
+        # SADD + SCARD in one transaction: exactly one of two concurrent
+        # voters sees the count reach 2
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.sadd(key, user_id)
+            pipe.scard(key)
+            pipe.expire(key, self.VOTES_TTL)
+            _, count, _ = await pipe.execute()
+        return count
+
+    async def remove_vote(self, room_id, user_id):
+        await self.client.srem(self._votes_key(room_id), user_id)
+
+    async def clear_votes(self, room_id):
+        await self.client.delete(self._votes_key(room_id))
+
+    async def _owner(self, room_id) -> str | None:
+        owner = await self.client.get(self._owner_key(room_id))
+        return owner.decode() if isinstance(owner, bytes) else owner
+
+    async def claim_room(self, room_id):
+        key = self._owner_key(room_id)
+        if not await self.client.set(key, self.node_id, nx=True, ex=self.OWNER_TTL):
+            if await self._owner(room_id) != self.node_id:
+                return False
+            await self.client.expire(key, self.OWNER_TTL)
+        self._owned.add(room_id)
+        return True
+
+    async def release_room(self, room_id):
+        if room_id not in self._owned:
+            return
+        self._owned.discard(room_id)
+        # our heartbeat kept the key alive, so it can't change hands between
+        # the GET and the DEL
+        if await self._owner(room_id) == self.node_id:
+            await self.client.delete(self._owner_key(room_id))
+
+    async def _keep_owned(self):
+        while True:
+            await asyncio.sleep(self.OWNER_TTL / 3)
+            try:
+                rooms = list(self._owned)
+                if not rooms:
+                    continue
+                async with self.client.pipeline(transaction=False) as pipe:
+                    for room_id in rooms:
+                        pipe.expire(self._owner_key(room_id), self.OWNER_TTL)
+                    refreshed = await pipe.execute()
+
+                for room_id, ok in zip(rooms, refreshed):
+                    # the key expired (e.g. Redis was unreachable): claim again
+                    if not ok and room_id in self._owned and not await self.claim_room(room_id):
+                        self._owned.discard(room_id)
+                        print(f"[BACKPLANE] room {room_id} is now owned by another worker")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[BACKPLANE] owner refresh failed: {e!r}")
+
+
+def build_backplane(kind: str = BACKPLANE) -> Backplane:
+    if kind == "memory":
+        return InMemoryBackplane()
+    if kind == "redis":
+        return RedisBackplane()
+    raise ValueError(f"Unknown BACKPLANE: {kind}")
@@ -0,0 +1,247 @@
+import asyncio
+import json
+import time
+
+from fastapi import WebSocket
+
+from app.config import WS_SEND_TIMEOUT, WS_JSON_ENCODER
+from app.services.backplane import Backplane, build_backplane
+
+try:
+    import orjson
+except ImportError:  # optional – plain json works the same, only slower
+    orjson = None
+
+
+# "try again later" – the client was too slow to keep up with the room
+SLOW_CONSUMER_CLOSE_CODE = 1013
+# the room's live state is owned by another worker – the client reconnects
+ROOM_ELSEWHERE_CLOSE_CODE = 4409
+
+
+def _dumps_json(message: dict) -> str:
+    return json.dumps(message)
+
+
+def _dumps_orjson(message: dict) -> str:
+    # personalScores is keyed by user id (int keys); still sent as a text
+    # frame because the client does JSON.parse(msg.data)
+    return orjson.dumps(message, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+def get_encoder(name: str = WS_JSON_ENCODER):
+    if name == "orjson" and orjson is not None:
+        return _dumps_orjson
+    return _dumps_json
+
+
+def _holds(conns: list[WebSocket], ws: WebSocket) -> bool:
+    # identity, not ==: WebSocket compares by its ASGI scope
+    return any(c is ws for c in conns)
+
+
+class SendStats:
+    """Send latency of one room (every recipient of every message)."""
+
+    __slots__ = ("sends", "total_ms", "max_ms", "dropped")
+
+    def __init__(self):
+        self.sends = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.dropped = 0
+
+    def record(self, ms: float):
+        self.sends += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def as_dict(self) -> dict:
+        return {
+            "sends": self.sends,
+            "avg_ms": round(self.total_ms / self.sends, 3) if self.sends else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "dropped": self.dropped,
+        }
+
+
+# ====================================================
+# Connection Manager
+# ====================================================
+class ConnectionManager:
+    """
+    Sockets of every room on this worker.
+
+    A broadcast serializes the message once and sends it to every recipient
+    concurrently, each send bounded by `send_timeout`. A recipient that times
+    out or errors is dropped from the room and closed, so one slow client
+    never holds up the others.
+
+    The same encoded message is published on the backplane, and the other
+    workers deliver it to the room's sockets they hold (see backplane.py).
+    """
+
+    def __init__(self, send_timeout: float = WS_SEND_TIMEOUT, encoder=None,
+                 backplane: Backplane | None = None):
+        self.active_connections: dict[int, list[WebSocket]] = {}
+        self.send_timeout = send_timeout
+        self.encode = encoder or get_encoder()
+        self.backplane = backplane or build_backplane()
+        self.send_stats: dict[int, SendStats] = {}
+        self.dropped_total = 0
+        # backplane-wide id of each local socket (for broadcast_except),
+        # keyed by id(ws): a WebSocket is a Mapping, so not hashable
+        self._conn_ids: dict[int, str] = {}
+        self._next_conn = 0
+
+    async def start(self):
+        await self.backplane.start(self._on_backplane)
+
+    async def close(self):
+        await self.backplane.close()
+
+    async def connect(self, room_id: int, ws: WebSocket):
+        conns = self.active_connections.setdefault(room_id, [])
+        conns.append(ws)
+        self._next_conn += 1
+        self._conn_ids[id(ws)] = f"{self.backplane.node_id}:{self._next_conn}"
+        if len(conns) == 1:
+            await self.backplane.subscribe(room_id)
+
+    async def disconnect(self, room_id: int, ws: WebSocket):
+        conns = self.active_connections.get(room_id)
+        if not conns or not _holds(conns, ws):
+            return
+        conns[:] = [c for c in conns if c is not ws]
+        self._conn_ids.pop(id(ws), None)
+        if not conns:
+            del self.active_connections[room_id]
+            await self.backplane.unsubscribe(room_id)
+
+    async def send(self, ws: WebSocket, message: dict, room_id: int | None = None):
+        await self._send_text(room_id, ws, self.encode(message))
+
+    async def broadcast(self, room_id: int, message: dict):
+        await self._fan_out(room_id, message, None)
+
+    async def broadcast_except(self, room_id: int, message: dict, except_ws: WebSocket):
+        await self._fan_out(room_id, message, except_ws)
+
+    async def _fan_out(self, room_id: int, message: dict, except_ws: WebSocket | None):
+        text = self.encode(message)  # once, whatever the number of recipients
+
+        exclude = self._conn_ids.get(id(except_ws)) if except_ws is not None else None
+        await self._publish(room_id, {"kind": "message", "text": text, "exclude": exclude})
+        await self._deliver(room_id, text, exclude)
+
+    async def _deliver(self, room_id: int, text: str, exclude: str | None):
+        conns = [
+            ws for ws in self.active_connections.get(room_id, [])
+            if exclude is None or self._conn_ids.get(id(ws)) != exclude
+        ]
+        if len(conns) == 1:
+            await self._send_text(room_id, conns[0], text)
+        elif conns:
+            await asyncio.gather(*(self._send_text(room_id, ws, text) for ws in conns))
+
+    async def _publish(self, room_id: int, envelope: dict):
+        try:
+            await self.backplane.publish(room_id, envelope)
+        except Exception as e:
+            # the local sockets still get the message
+            print(f"[BACKPLANE] publish to room {room_id} failed: {e!r}")
+
+    async def _on_backplane(self, room_id: int, envelope: dict):
+        # an event of the same room raised on another worker
+        if envelope.get("kind") == "close":
+            await self._close_local(room_id)
+        else:
+            await self._deliver(room_id, envelope["text"], envelope.get("exclude"))
+
+    async def _send_text(self, room_id: int | None, ws: WebSocket, text: str):
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(ws.send_text(text), self.send_timeout)
+        except Exception:
+            # timed out, or the socket is already gone
+            if room_id is not None:
+                await self._drop(room_id, ws)
+            return
+
+        if room_id is not None:
+            stats = self.send_stats.setdefault(room_id, SendStats())
+            stats.record((time.perf_counter() - started) * 1000)
+
+    async def _drop(self, room_id: int, ws: WebSocket):
+        if not _holds(self.active_connections.get(room_id, []), ws):
+            return
+        await self.disconnect(room_id, ws)
+        self.send_stats.setdefault(room_id, SendStats()).dropped += 1
+        self.dropped_total += 1
+        print(f"[WS] dropped slow client in room {room_id}")
+
+        # its own receive loop then ends with WebSocketDisconnect
+        try:
+            await asyncio.wait_for(ws.close(code=SLOW_CONSUMER_CLOSE_CODE), self.send_timeout)
+        except Exception:
+            pass
+
+    async def close_room(self, room_id: int):
+        """Close the room's sockets on every worker and forget its votes."""
+        await self._publish(room_id, {"kind": "close"})
+        await self.clear_votes(room_id)
+        await self._close_local(room_id)
+
+    async def _close_local(self, room_id: int):
+        conns = list(self.active_connections.get(room_id, []))
+        for ws in conns:
+            await self.disconnect(room_id, ws)
+        self.send_stats.pop(room_id, None)
+        for ws in conns:
+            try:
+                await asyncio.wait_for(ws.close(), self.send_timeout)
+            except Exception:
+                pass
+
+    # -------------------------
+    # next-round votes (shared by all workers)
+    # -------------------------
+    async def add_vote(self, room_id: int, user_id: int) -> int:
+        return await self.backplane.add_vote(room_id, user_id)
+
+    async def remove_vote(self, room_id: int, user_id: int):
+        await self.backplane.remove_vote(room_id, user_id)
+
+    async def clear_votes(self, room_id: int):
+        await self.backplane.clear_votes(room_id)
+
+    async def claim_room(self, room_id: int) -> bool:
+        try:
+            return await self.backplane.claim_room(room_id)
+        except Exception as e:
+            # can't tell who owns it – refuse, the client tries again
+            print(f"[BACKPLANE] claim of room {room_id} failed: {e!r}")
+            return False
+
+    async def release_room(self, room_id: int):
+        try:
+            await self.backplane.release_room(room_id)
+        except Exception as e:
+            print(f"[BACKPLANE] release of room {room_id} failed: {e!r}")
+
+    def stats(self) -> dict:
+        return {
+            "encoder": "orjson" if self.encode is _dumps_orjson else "json",
+            "backplane": type(self.backplane).__name__,
+            "rooms": len(self.active_connections),
+            "connections": sum(len(c) for c in self.active_connections.values()),
+            "dropped_total": self.dropped_total,
+            "send_latency": {
+                room_id: stats.as_dict() for room_id, stats in self.send_stats.items()
+            },
+        }
+
+
+# one per worker – sockets of every room served here
+manager = ConnectionManager()
@@ -0,0 +1,111 @@
+import time
+from typing import NamedTuple
+
+from app.config import EXECUTOR_BACKEND
+
+
+# executor-side failures: not a verdict about the submitted code
+EXECUTOR_BUSY = "Executor is busy, try again"
+WORKER_CRASHED = "Executor worker crashed"
+# the sandboxed process died without a result: an rlimit kill, os._exit() in
+# the submission, or a worker that died while idle – not cached either way
+WORKER_EXITED = "Executor process exited without a result, try again"
+EXECUTOR_UNAVAILABLE = "Executor is unavailable, try again"
+TRANSIENT_ERRORS = {EXECUTOR_BUSY, WORKER_CRASHED, WORKER_EXITED, EXECUTOR_UNAVAILABLE}
+
+
+class RunResult(NamedTuple):
+    stdout: str
+    stderr: str
+    duration_ms: float
+
+
+def is_failure(result: RunResult, expected: str | None) -> bool:
+    # same rule as verify_solution: any stderr, or stdout != expected
+    if result.stderr:
+        return True
+    return expected is not None and result.stdout.strip() != (expected or "").strip()
+
+
+class Executor:
+    """
+    A code-execution backend behind `run_code`.
+
+    Backends return the same `(stdout, stderr)` pair, so `verify_solution`
+    and `/test/piston` work unchanged whichever one is configured.
+    """
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def run(self, language: str, code: str, stdin: str) -> tuple[str, str]:
+        raise NotImplementedError
+
+    async def run_batch(self, language: str, code: str, stdins: list[str],
+                        expected: list[str] | None = None,
+                        fail_fast: bool = False) -> list[RunResult]:
+        """
+        Run the code once per stdin and return one result per test, in order.
+
+        With `fail_fast`, stop after the first test that errors or times out;
+        this default, which runs every test from here, also stops at the first
+        output that differs from `expected`. `expected` never goes into the
+        sandbox (the submission could read it), so callers compare outputs.
+        Backends that can run a whole batch in one sandbox session override
+        this; the default just calls `run` per test.
+        """
+        results = []
+        for i, stdin in enumerate(stdins):
+            started = time.perf_counter()
+            stdout, stderr = await self.run(language, code, stdin)
+            result = RunResult(stdout, stderr, (time.perf_counter() - started) * 1000)
+            results.append(result)
+
+            if fail_fast and expected is not None and is_failure(result, expected[i]):
+                break
+        return results
+
+    def stats(self) -> dict:
+        return {}
+
+
+def parse_batch(data: dict) -> list[RunResult]:
+    # `{"results": [...]}` answer of sandbox_runner.run_batch
+    return [RunResult(r["stdout"], r["stderr"], r["ms"]) for r in data["results"]]
+
+
+_executor: Executor | None = None
+
+
+def _build_executor(backend: str) -> Executor:
+    if backend == "piston":
+        from app.services.piston import PistonExecutor
+        return PistonExecutor()
+    if backend == "local":
+        from app.services.local_executor import LocalExecutor
+        return LocalExecutor()
+    if backend == "warm":
+        from app.services.worker_pool import WarmWorkerPool
+        return WarmWorkerPool()
+    raise ValueError(f"Unknown EXECUTOR_BACKEND: {backend}")
+
+
+def get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        _executor = _build_executor(EXECUTOR_BACKEND)
+    return _executor
+
+
+async def start_executor():
+    await get_executor().start()
+
+
+async def close_executor():
+    global _executor
+    if _executor is not None:
+        await _executor.close()
+        _executor = None
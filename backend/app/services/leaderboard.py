@@ -0,0 +1,226 @@
+import asyncio
+import random
+import secrets
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import LEADERBOARD_REFRESH_SECONDS
+from app.models.user import User
+
+
+# -------------------------------------
+# Indexable skiplist
+# -------------------------------------
+# Sorted by key; every link also stores its width (how many entries it
+# skips), so both "entry at position i" and "position of key" are
+# O(log n) walks down the levels.
+_MAX_LEVEL = 24  # enough for ~16M entries
+
+
+class _Node:
+    __slots__ = ("key", "value", "next", "width")
+
+    def __init__(self, key, value, level: int):
+        self.key = key
+        self.value = value
+        self.next: list["_Node | None"] = [None] * level
+        self.width = [1] * level
+
+
+class RankedSkipList:
+
+    def __init__(self):
+        self.head = _Node(None, None, _MAX_LEVEL)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @staticmethod
+    def _random_level() -> int:
+        level = 1
+        while level < _MAX_LEVEL and random.random() < 0.5:
+            level += 1
+        return level
+
+    def _path(self, key):
+        # last node before `key` on every level, and its position
+        chain = [self.head] * _MAX_LEVEL
+        positions = [0] * _MAX_LEVEL
+        node, position = self.head, 0
+        for level in reversed(range(_MAX_LEVEL)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+            positions[level] = position
+        return chain, positions
+
+    def insert(self, key, value):
+        chain, positions = self._path(key)
+        level = self._random_level()
+        new = _Node(key, value, level)
+        for lvl in range(level):
+            prev = chain[lvl]
+            skipped = positions[0] - positions[lvl]
+            new.next[lvl] = prev.next[lvl]
+            prev.next[lvl] = new
+            new.width[lvl] = prev.width[lvl] - skipped
+            prev.width[lvl] = skipped + 1
+        for lvl in range(level, _MAX_LEVEL):
+            chain[lvl].width[lvl] += 1
+        self.size += 1
+
+    def remove(self, key) -> bool:
+        chain, _ = self._path(key)
+        node = chain[0].next[0]
+        if node is None or node.key != key:
+            return False
+        for lvl in range(len(node.next)):
+            prev = chain[lvl]
+            prev.width[lvl] += node.width[lvl] - 1
+            prev.next[lvl] = node.next[lvl]
+        for lvl in range(len(node.next), _MAX_LEVEL):
+            chain[lvl].width[lvl] -= 1
+        self.size -= 1
+        return True
+
+    def index(self, key) -> int | None:
+        """0-based position of `key`, or None."""
+        chain, positions = self._path(key)
+        node = chain[0].next[0]
+        if node is None or node.key != key:
+            return None
+        return positions[0]
+
+    def slice(self, start: int, count: int) -> list:
+        """Values at positions start .. start + count - 1."""
+        if start < 0 or start >= self.size or count <= 0:
+            return []
+        node, remaining = self.head, start + 1
+        for level in reversed(range(_MAX_LEVEL)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        values = []
+        while node is not None and len(values) < count:
+            values.append(node.value)
+            node = node.next[0]
+        return values
+
+
+# ====================================================
+# Leaderboard
+# ====================================================
+class Leaderboard:
+    """
+    Users ranked by score (ties: lower user id first), kept in memory.
+
+    Seeded from `users` at startup, updated in place when a score changes
+    (finish_room) or a user registers, and fully reloaded every
+    LEADERBOARD_REFRESH_SECONDS to pick up other workers' changes. Top-N,
+    paging and rank lookups never touch the DB.
+
+    `etag` changes with every update; its random epoch is renewed on every
+    reload, so two workers never hand out the same tag for different data.
+    """
+
+    def __init__(self, refresh_seconds: float = LEADERBOARD_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._list = RankedSkipList()
+        # user_id -> skiplist key
+        self._keys: dict[int, tuple] = {}
+        self._epoch = secrets.token_hex(4)
+        self.version = 0
+        self._loaded_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _key(user_id: int, score: int) -> tuple:
+        return -score, user_id
+
+    @property
+    def etag(self) -> str:
+        return f'W/"{self._epoch}.{self.version}"'
+
+    def __len__(self):
+        return len(self._list)
+
+    # -------------------------
+    # loading
+    # -------------------------
+    async def load(self, db: AsyncSession):
+        rows = (await db.execute(
+            select(User.id, User.username, User.score)
+        )).all()
+
+        ranked = RankedSkipList()
+        keys = {}
+        for user_id, username, score in rows:
+            key = self._key(user_id, score or 0)
+            ranked.insert(key, (user_id, username, score or 0))
+            keys[user_id] = key
+
+        self._list, self._keys = ranked, keys
+        self._epoch = secrets.token_hex(4)
+        self.version = 0
+        self._loaded_at = time.monotonic()
+
+    async def ensure_loaded(self, db: AsyncSession):
+        fresh = (
+            self._loaded_at is not None
+            and time.monotonic() - self._loaded_at < self.refresh_seconds
+        )
+        if fresh:
+            return
+        async with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_seconds:
+                await self.load(db)
+
+    # -------------------------
+    # updates
+    # -------------------------
+    def set_score(self, user_id: int, username: str, score: int):
+        key = self._key(user_id, score or 0)
+        old = self._keys.get(user_id)
+        if old is not None:
+            self._list.remove(old)
+        self._list.insert(key, (user_id, username, score or 0))
+        self._keys[user_id] = key
+        self.version += 1
+
+    # -------------------------
+    # queries
+    # -------------------------
+    def page(self, offset: int = 0, limit: int = 10) -> list[dict]:
+        return [
+            {"rank": offset + i + 1, "user_id": user_id, "username": username, "score": score}
+            for i, (user_id, username, score) in enumerate(self._list.slice(offset, limit))
+        ]
+
+    def rank(self, user_id: int) -> int | None:
+        """1-based rank of the user, or None if unknown."""
+        key = self._keys.get(user_id)
+        if key is None:
+            return None
+        return self._list.index(key) + 1
+
+    def around(self, user_id: int, neighbours: int = 2) -> dict | None:
+        """The user's rank with up to `neighbours` entries above and below."""
+        rank = self.rank(user_id)
+        if rank is None:
+            return None
+        start = max(0, rank - 1 - neighbours)
+        return {
+            "rank": rank,
+            "total": len(self._list),
+            "entries": self.page(start, rank - start + neighbours),
+        }
+
+    def stats(self) -> dict:
+        return {"users": len(self._list), "version": self.version, "etag": self.etag}
+
+
+leaderboard = Leaderboard()
@@ -0,0 +1,243 @@
+import asyncio
+import ctypes
+import inspect
+import json
+import os
+import resource
+import signal
+import subprocess
+
+from app.config import (
+    LOCAL_EXECUTOR_WORKERS,
+    LOCAL_EXECUTOR_TIMEOUT,
+    LOCAL_EXECUTOR_CPU_SECONDS,
+    LOCAL_EXECUTOR_MEMORY_MB,
+    LOCAL_EXECUTOR_PYTHON,
+    SANDBOX_UID,
+    SANDBOX_GID,
+)
+from app.services.executor import Executor, RunResult, parse_batch, WORKER_EXITED
+from app.services import sandbox_runner
+from app.services.sandbox_runner import RESULT_MARKER
+
+# passed with -c: the app directory doesn't have to be readable by the sandbox user
+RUNNER_SOURCE = inspect.getsource(sandbox_runner)
+PYTHON_LANGUAGES = {"python", "python3", "py"}
+
+CLONE_NEWNS = 0x00020000
+CLONE_NEWNET = 0x40000000
+MS_NOSUID, MS_NODEV, MS_NOEXEC = 0x2, 0x4, 0x8
+MS_REC, MS_PRIVATE = 0x4000, 0x40000
+PR_SET_NO_NEW_PRIVS = 38
+_libc = ctypes.CDLL(None, use_errno=True)
+
+
+class SandboxUnavailable(RuntimeError):
+    pass
+
+
+def _check(result: int, what: str):
+    if result != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f"{what}: {os.strerror(errno)}")
+
+
+def _mount(source: str, target: str, fstype: str | None, flags: int, data: str | None = None):
+    _check(_libc.mount(source.encode(), target.encode(),
+                       fstype.encode() if fstype else None, flags,
+                       data.encode() if data else None), f"mount {target}")
+
+
+def limit_child():
+    """
+    Runs in the forked child right before exec and fails the spawn (never
+    falls back) when a step is refused:
+
+      - own process group, no privileges gained by exec,
+      - empty network namespace – no network at all,
+      - own mount namespace: a fresh /proc with hidepid=2 (the server and
+        its environment are invisible) and private, empty tmpfs scratch
+        dirs instead of the host's /tmp, /var/tmp and /dev/shm,
+      - the unprivileged SANDBOX_UID / SANDBOX_GID, no supplementary groups,
+      - rlimits, set after the uid switch so RLIMIT_NPROC blocks fork().
+
+    The CPU hard limit stays open: a process may run several tests, so the
+    runner moves the soft limit forward before each one.
+    """
+    os.setsid()
+    _check(_libc.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0), "no_new_privs")
+
+    _check(_libc.unshare(CLONE_NEWNET | CLONE_NEWNS), "unshare")
+    # mounts below stay in this namespace
+    _mount("none", "/", None, MS_REC | MS_PRIVATE)
+    _mount("proc", "/proc", "proc", MS_NOSUID | MS_NODEV | MS_NOEXEC, "hidepid=2")
+    for scratch in ("/tmp", "/var/tmp", "/dev/shm"):
+        if os.path.isdir(scratch):
+            _mount("tmpfs", scratch, "tmpfs", MS_NOSUID | MS_NODEV,
+                   "size=16m,mode=1777")
+    os.chdir("/tmp")
+
+    os.setgroups([])
+    os.setgid(SANDBOX_GID)
+    os.setuid(SANDBOX_UID)
+
+    cpu = LOCAL_EXECUTOR_CPU_SECONDS
+    memory = LOCAL_EXECUTOR_MEMORY_MB * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, resource.RLIM_INFINITY))
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (1024 * 1024, 1024 * 1024))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (64, 64))
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+
+
+def sandbox_command(*args: str) -> list[str]:
+    return [LOCAL_EXECUTOR_PYTHON, "-I", "-S", "-c", RUNNER_SOURCE, *args]
+
+
+async def spawn_sandboxed(spawn, count: int) -> list:
+    """
+    Start the first `count` sandboxed processes; the backend refuses to start
+    when the sandbox can't be set up.
+    """
+    if 0 in (SANDBOX_UID, SANDBOX_GID) or SANDBOX_UID == os.getuid():
+        raise SandboxUnavailable(
+            "SANDBOX_UID / SANDBOX_GID must be an unprivileged user other than the server's"
+        )
+    try:
+        return await asyncio.gather(*(spawn() for _ in range(count)))
+    except (subprocess.SubprocessError, OSError) as e:
+        raise SandboxUnavailable(
+            f"Cannot start sandboxed submissions ({e}). The local / warm executor "
+            "needs root or CAP_SYS_ADMIN + CAP_SETUID + CAP_SETGID (namespaces, "
+            "mounts, uid switch), and LOCAL_EXECUTOR_PYTHON must be executable "
+            "by SANDBOX_UID"
+        ) from e
+
+
+def kill_process(proc):
+    # the child is its own process group leader – kill the whole group
+    if proc.returncode is None:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def unsupported(language: str) -> str | None:
+    if language.lower() in PYTHON_LANGUAGES:
+        return None
+    return f"Language '{language}' is not supported by the local executor"
+
+
+class LocalExecutor(Executor):
+    """
+    Runs Python submissions on this machine in sandboxed subprocesses.
+
+    `LOCAL_EXECUTOR_WORKERS` interpreters are started ahead of time and wait
+    for a job on stdin, so a run only pays for the code itself; every used
+    process is replaced in the background. Each test gets a wall-clock timeout
+    on top of the CPU / memory rlimits, and a batch runs all tests of a
+    submission in one process.
+    """
+
+    def __init__(self, workers: int = LOCAL_EXECUTOR_WORKERS,
+                 timeout: float = LOCAL_EXECUTOR_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self._ready: asyncio.Queue | None = None
+        self._spawning: set[asyncio.Task] = set()
+        self._closed = False
+
+    async def _spawn(self):
+        return await asyncio.create_subprocess_exec(
+            *sandbox_command(),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            # nothing of the server's environment (SECRET_KEY, DATABASE_URL)
+            env={"PYTHONIOENCODING": "utf-8"},
+            preexec_fn=limit_child,
+        )
+
+    def _replenish(self):
+        async def spawn_one():
+            proc = await self._spawn()
+            if self._closed:
+                kill_process(proc)
+            else:
+                self._ready.put_nowait(proc)
+
+        task = asyncio.create_task(spawn_one())
+        self._spawning.add(task)
+        task.add_done_callback(self._spawning.discard)
+
+    async def start(self):
+        if self._ready is not None:
+            return
+        self._ready = asyncio.Queue()
+        for proc in await spawn_sandboxed(self._spawn, self.workers):
+            self._ready.put_nowait(proc)
+
+    async def close(self):
+        self._closed = True
+        for task in list(self._spawning):
+            task.cancel()
+        if self._ready is None:
+            return
+        while not self._ready.empty():
+            proc = self._ready.get_nowait()
+            kill_process(proc)
+            await proc.wait()
+
+    async def _run_job(self, job: dict, tests: int) -> tuple[dict | None, str]:
+        """Send one job to a pre-started process; returns (result, error)."""
+        await self.start()
+        proc = await self._ready.get()
+        self._replenish()
+
+        job.update(timeout=self.timeout, cpu_seconds=LOCAL_EXECUTOR_CPU_SECONDS)
+        # the runner times every test itself; this only catches a stuck process
+        wall = self.timeout * tests + 1
+
+        try:
+            out, err = await asyncio.wait_for(
+                proc.communicate(json.dumps(job).encode()), wall
+            )
+        except asyncio.TimeoutError:
+            kill_process(proc)
+            await proc.wait()
+            return None, "Time limit exceeded"
+        finally:
+            kill_process(proc)
+
+        _, marker, payload = out.decode(errors="replace").partition(RESULT_MARKER)
+        if not marker:
+            # killed by an rlimit (CPU / memory), os._exit() in the submission
+            # or the idle worker died before getting the job
+            message = err.decode(errors="replace").strip()[-200:]
+            print(f"[EXECUTOR] process exited with code {proc.returncode}: {message!r}")
+            return None, WORKER_EXITED
+
+        return json.loads(payload), ""
+
+    async def run(self, language: str, code: str, stdin: str):
+        error = unsupported(language)
+        if error:
+            return "", error
+
+        result, error = await self._run_job({"code": code, "stdin": stdin}, 1)
+        if result is None:
+            return "", error
+        return result["stdout"], result["stderr"]
+
+    async def run_batch(self, language, code, stdins, expected=None, fail_fast=False):
+        error = unsupported(language)
+        if error:
+            return [RunResult("", error, 0.0)]
+
+        # `expected` stays here: the host compares, the sandbox never sees it
+        job = {"code": code, "stdins": stdins, "fail_fast": fail_fast}
+        result, error = await self._run_job(job, len(stdins))
+        if result is None:
+            return [RunResult("", error, 0.0)]
+        return parse_batch(result)
@@ -0,0 +1,252 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+from sqlalchemy import select, update, func
+
+from app.config import MATCH_TIMEOUT, MATCH_SCORE_BUCKET
+from app.database import AsyncSessionLocal
+from app.models.room import Room
+from app.models.room_player import RoomPlayer
+
+
+MATCH_FOUND = "Match found! Game starting."
+ROOM_CREATED = "New room created. Waiting for opponent."
+
+
+class Ticket:
+    __slots__ = ("user_id", "bucket", "future", "created_at", "claimed")
+
+    def __init__(self, user_id: int, bucket: int):
+        self.user_id = user_id
+        self.bucket = bucket
+        self.future = asyncio.get_running_loop().create_future()
+        self.created_at = time.monotonic()
+        # popped by a caller that is creating the room for both of us
+        self.claimed = False
+
+
+class Matchmaker:
+    """
+    In-memory matchmaking queue of this worker.
+
+    `find_match` pairs the caller with a queued player of the same bucket
+    (score // MATCH_SCORE_BUCKET; the neighbouring buckets are tried next)
+    or queues them and waits up to MATCH_TIMEOUT. Popping
+    a ticket claims it with no await in between, so a queued player is never
+    handed to two callers; a claimed player whose wait times out while the
+    room is being created keeps waiting for that room.
+
+    A caller that times out takes over a waiting room in the DB (opened by
+    a timed-out player of any worker) with a conditional UPDATE, or opens
+    one and registers it here, so the next caller joins it without waiting;
+    a player who queued while the room was being opened is handed it at once.
+    """
+
+    def __init__(self, timeout: float = MATCH_TIMEOUT, score_bucket: int = MATCH_SCORE_BUCKET):
+        self.timeout = timeout
+        self.score_bucket = score_bucket
+        # bucket -> queued tickets (oldest first)
+        self._queues: dict[int, OrderedDict[int, Ticket]] = {}
+        # bucket -> waiting rooms opened here: room_id -> owner user_id
+        self._open_rooms: dict[int, OrderedDict[int, int]] = {}
+        self._tickets: dict[int, Ticket] = {}
+        self.matched = 0
+        self.timed_out = 0
+
+    def bucket_for(self, score: int) -> int:
+        return (score or 0) // self.score_bucket if self.score_bucket > 0 else 0
+
+    def _candidates(self, bucket: int):
+        # own bucket first, then one skill level up / down
+        yield bucket
+        if self.score_bucket > 0:
+            yield bucket + 1
+            if bucket > 0:
+                yield bucket - 1
+
+    # -------------------------
+    # public
+    # -------------------------
+    async def find_match(self, user_id: int, score: int) -> dict:
+        queued = self._tickets.get(user_id)
+        if queued is not None:
+            # same user clicked twice – both requests get the same answer
+            return await asyncio.shield(queued.future)
+
+        bucket = self.bucket_for(score)
+
+        room_id = await self._join_open_room(bucket, user_id)
+        if room_id is not None:
+            return {"room_id": room_id, "message": MATCH_FOUND}
+
+        opponent = self._pop_ticket(bucket, user_id)
+        if opponent is not None:
+            # shielded: the opponent waits for this room even if our request goes away
+            return await asyncio.shield(self._pair(opponent, user_id))
+
+        ticket = Ticket(user_id, bucket)
+        self._queues.setdefault(bucket, OrderedDict())[user_id] = ticket
+        self._tickets[user_id] = ticket
+        try:
+            return await asyncio.wait_for(asyncio.shield(ticket.future), self.timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._remove_ticket(ticket)
+
+        if ticket.future.done():
+            # paired right at the deadline
+            return ticket.future.result()
+        if ticket.claimed:
+            # popped before the deadline, the room is being created – _pair
+            # resolves the future either way
+            return await ticket.future
+
+        self.timed_out += 1
+        result = await self._open_room(bucket, user_id)
+        ticket.future.set_result(result)
+        return result
+
+    def forget_room(self, room_id: int):
+        for rooms in self._open_rooms.values():
+            rooms.pop(room_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._tickets),
+            "open_rooms": sum(len(r) for r in self._open_rooms.values()),
+            "matched": self.matched,
+            "timed_out": self.timed_out,
+        }
+
+    # -------------------------
+    # queue
+    # -------------------------
+    def _pop_ticket(self, bucket: int, user_id: int) -> Ticket | None:
+        for key in self._candidates(bucket):
+            queue = self._queues.get(key)
+            while queue:
+                _, ticket = queue.popitem(last=False)
+                self._tickets.pop(ticket.user_id, None)
+                if ticket.user_id != user_id and not ticket.future.done() and not ticket.claimed:
+                    ticket.claimed = True
+                    return ticket
+        return None
+
+    def _remove_ticket(self, ticket: Ticket):
+        queue = self._queues.get(ticket.bucket)
+        if queue is not None and queue.get(ticket.user_id) is ticket:
+            del queue[ticket.user_id]
+        if self._tickets.get(ticket.user_id) is ticket:
+            del self._tickets[ticket.user_id]
+
+    async def _pair(self, opponent: Ticket, user_id: int) -> dict:
+        try:
+            async with AsyncSessionLocal() as db:
+                room = Room(status="playing")
+                db.add(room)
+                await db.flush()
+                db.add_all([
+                    RoomPlayer(room_id=room.id, user_id=opponent.user_id, connected=False),
+                    RoomPlayer(room_id=room.id, user_id=user_id, connected=False),
+                ])
+                await db.commit()
+        except Exception as e:
+            if not opponent.future.done():
+                opponent.future.set_exception(e)
+            raise
+
+        print(f"[MATCH] users {opponent.user_id} and {user_id} → room {room.id}")
+        self.matched += 1
+        result = {"room_id": room.id, "message": MATCH_FOUND}
+        if not opponent.future.done():
+            opponent.future.set_result(result)
+        return result
+
+    # -------------------------
+    # waiting rooms
+    # -------------------------
+    async def _join_open_room(self, bucket: int, user_id: int) -> int | None:
+        for key in self._candidates(bucket):
+            rooms = self._open_rooms.get(key)
+            while rooms:
+                room_id, owner = rooms.popitem(last=False)
+                if owner != user_id and await self._claim_room(room_id, user_id):
+                    return room_id
+        return None
+
+    async def _claim_room(self, room_id: int, user_id: int) -> bool:
+        """Join a waiting room – one conditional UPDATE, so only one caller can."""
+        async with AsyncSessionLocal() as db:
+            claimed = await db.scalar(
+                update(Room)
+                .where(Room.id == room_id, Room.status == "waiting")
+                .values(status="playing")
+                .returning(Room.id)
+            )
+            if claimed is None:
+                await db.rollback()
+                return False
+            db.add(RoomPlayer(room_id=room_id, user_id=user_id, connected=False))
+            await db.commit()
+
+        print(f"[MATCH] Room {room_id} has 1 player → adding user {user_id}")
+        self.matched += 1
+        return True
+
+    async def _open_room(self, bucket: int, user_id: int) -> dict:
+        # a waiting room opened by a player on another worker
+        async with AsyncSessionLocal() as db:
+            waiting = (await db.scalars(
+                select(Room.id)
+                .join(RoomPlayer)
+                .where(Room.status == "waiting", RoomPlayer.user_id != user_id)
+                .group_by(Room.id)
+                .having(func.count(RoomPlayer.id) == 1)
+                .limit(5)
+            )).all()
+        for room_id in waiting:
+            if await self._claim_room(room_id, user_id):
+                return {"room_id": room_id, "message": MATCH_FOUND}
+
+        async with AsyncSessionLocal() as db:
+            room = Room(status="waiting")
+            db.add(room)
+            await db.flush()
+            db.add(RoomPlayer(room_id=room.id, user_id=user_id, connected=False))
+            await db.commit()
+
+        print(f"[NEW ROOM] Created room {room.id} with first player {user_id}")
+        rooms = self._open_rooms.setdefault(bucket, OrderedDict())
+        rooms[room.id] = user_id
+
+        # a player may have queued while the room was being opened – they'd
+        # wait a whole MATCH_TIMEOUT for it; shielded like _pair, the queued
+        # player is answered even if our request goes away
+        if await asyncio.shield(self._offer_room(bucket, room.id, user_id)):
+            rooms.pop(room.id, None)
+            return {"room_id": room.id, "message": MATCH_FOUND}
+        return {"room_id": room.id, "message": ROOM_CREATED}
+
+    async def _offer_room(self, bucket: int, room_id: int, owner: int) -> bool:
+        """Hand a just-opened waiting room to a queued player; True if they joined."""
+        opponent = self._pop_ticket(bucket, owner)
+        if opponent is None:
+            return False
+        try:
+            joined = await self._claim_room(room_id, opponent.user_id)
+            # taken by a player of another worker in the meantime: the queued
+            # player gets what their timeout would have given them
+            result = ({"room_id": room_id, "message": MATCH_FOUND} if joined
+                      else await self._open_room(opponent.bucket, opponent.user_id))
+        except Exception as e:
+            if not opponent.future.done():
+                opponent.future.set_exception(e)
+            raise
+        if not opponent.future.done():
+            opponent.future.set_result(result)
+        return joined
+
+
+matchmaker = Matchmaker()
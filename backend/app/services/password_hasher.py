@@ -0,0 +1,136 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from passlib.context import CryptContext
+
+from app.config import BCRYPT_ROUNDS, HASH_WORKERS, HASH_MAX_PENDING
+
+
+# -------------------------------------
+# Runs inside the hashing processes
+# -------------------------------------
+# bcrypt burns ~250 ms of CPU per call at cost 12. A process pool keeps
+# that off the event loop and off the threadpool serving every other sync
+# endpoint, and scales with cores.
+_context: CryptContext | None = None
+
+
+def _crypt_context(rounds: int) -> CryptContext:
+    global _context
+    if _context is None:
+        _context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+    return _context
+
+
+def _warm(rounds: int):
+    _crypt_context(rounds)
+
+
+def _hash(password: str, rounds: int) -> str:
+    return _crypt_context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed: str, rounds: int):
+    # (ok, new_hash) – new_hash is set when the stored cost is outdated
+    return _crypt_context(rounds).verify_and_update(password, hashed)
+
+
+class HasherBusy(Exception):
+    """More hash jobs than HASH_MAX_PENDING are already admitted."""
+
+
+class PasswordHasher:
+    """
+    bcrypt on a dedicated, size-limited process pool.
+
+    At most `max_pending` jobs are admitted (running + queued); the next one
+    is rejected right away with HasherBusy instead of growing an unbounded
+    backlog behind a login storm.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING,
+                 rounds: int = BCRYPT_ROUNDS):
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self._pool: ProcessPoolExecutor | None = None
+        self.pending = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.restarts = 0
+
+    def _build_pool(self) -> ProcessPoolExecutor:
+        # spawn: the children only import this module, not the running app
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    async def start(self):
+        if self._pool is None:
+            self._pool = self._build_pool()
+            loop = asyncio.get_running_loop()
+            # start every process now rather than on the first logins
+            await asyncio.gather(*(
+                loop.run_in_executor(self._pool, _warm, self.rounds)
+                for _ in range(self.workers)
+            ))
+
+    async def close(self):
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            # joining the processes blocks – not on the event loop
+            await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
+
+    def _replace_pool(self, broken: ProcessPoolExecutor):
+        # every job of the broken pool fails at once; only the first one to
+        # get here replaces it, the others retry on the new pool
+        if self._pool is broken:
+            broken.shutdown(wait=False)
+            self._pool = self._build_pool()
+            self.restarts += 1
+
+    async def _run(self, fn, *args):
+        if self.max_pending and self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HasherBusy()
+
+        self.pending += 1
+        try:
+            if self._pool is None:
+                self._pool = self._build_pool()
+            pool = self._pool
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(pool, fn, *args)
+            except BrokenProcessPool:
+                # a hashing process died – replace the pool and retry once
+                self._replace_pool(pool)
+                return await loop.run_in_executor(self._pool, fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password, self.rounds)
+
+    async def verify_and_update(self, password: str, hashed: str):
+        ok, new_hash = await self._run(_verify_and_update, password, hashed, self.rounds)
+        if new_hash:
+            self.rehashed += 1
+        return ok, new_hash
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "restarts": self.restarts,
+            "rounds": self.rounds,
+        }
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,176 @@
+import asyncio
+import time
+from typing import NamedTuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.config import PROBLEM_CATALOG_REFRESH_SECONDS
+from app.database import AsyncSessionLocal
+from app.models.problem import Problem
+from app.services.verdict_cache import tests_version
+
+
+class TestSnapshot(NamedTuple):
+    input: str
+    expected_output: str
+
+
+class ProblemSnapshot(NamedTuple):
+    """
+    Immutable copy of a problem and its tests. Quacks like a `Problem` row
+    with `tests` loaded, so verify_solution / the room messages / the
+    ProblemResponse schema take it as is; safe to share between requests.
+    """
+    id: int
+    title: str
+    description: str | None
+    language: str
+    difficulty: str
+    code_with_bug: str
+    fixed_code: str
+    tests: tuple[TestSnapshot, ...]
+    # hash of the tests, computed once (see verdict_cache.tests_version)
+    tests_version: str
+
+    @classmethod
+    def from_row(cls, problem: Problem) -> "ProblemSnapshot":
+        tests = tuple(
+            TestSnapshot(t.input or "", t.expected_output or "") for t in problem.tests
+        )
+        snapshot = cls(
+            problem.id, problem.title, problem.description, problem.language,
+            problem.difficulty, problem.code_with_bug, problem.fixed_code, tests, ""
+        )
+        return snapshot._replace(tests_version=tests_version(snapshot))
+
+
+class ProblemCatalog:
+    """
+    Read-through cache of problem snapshots by id.
+
+    Warmed with every problem (tests eagerly loaded) at startup; a miss
+    reads the one problem and keeps it. `put` / `invalidate` keep it right
+    for changes made on this worker, and a background task reloads the
+    whole catalog every PROBLEM_CATALOG_REFRESH_SECONDS for changes made on
+    others. Requests never wait on a reload: they read the current dict
+    until the new one is swapped in. `version` goes up with every change.
+    """
+
+    def __init__(self, refresh_seconds: float = PROBLEM_CATALOG_REFRESH_SECONDS,
+                 batch: int = 100):
+        self.refresh_seconds = refresh_seconds
+        # problems (with their tests) read per query of a reload
+        self.batch = batch
+        self._snapshots: dict[int, ProblemSnapshot] = {}
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.last_load_ms = 0.0
+        self.last_error: str | None = None
+        # put / invalidate made while a reload runs: id -> snapshot (None = removed)
+        self._changed: dict[int, ProblemSnapshot | None] | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        if self._task is None and self.refresh_seconds > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await self.load(db)
+            except Exception as e:
+                self.last_error = repr(e)
+                print(f"[CATALOG] reload failed: {e!r}")
+
+    async def load(self, db: AsyncSession):
+        """
+        Builds a new dict, `batch` problems per query (the loop runs other
+        requests between pages), and swaps it in. Changes made on this
+        worker meanwhile are applied on top, so the reload can't undo them.
+        """
+        started = time.perf_counter()
+        self._changed = {}
+        try:
+            snapshots: dict[int, ProblemSnapshot] = {}
+            last_id = 0
+            while True:
+                problems = (await db.scalars(
+                    select(Problem)
+                    .options(selectinload(Problem.tests))
+                    .where(Problem.id > last_id)
+                    .order_by(Problem.id)
+                    .limit(self.batch)
+                )).all()
+                for p in problems:
+                    snapshots[p.id] = ProblemSnapshot.from_row(p)
+                # the rows are copied: don't keep the whole table in the session
+                db.expunge_all()
+                if len(problems) < self.batch:
+                    break
+                last_id = problems[-1].id
+
+            for problem_id, snapshot in self._changed.items():
+                if snapshot is None:
+                    snapshots.pop(problem_id, None)
+                else:
+                    snapshots[problem_id] = snapshot
+            self._snapshots = snapshots
+            self.version += 1
+        finally:
+            self._changed = None
+        self.last_load_ms = (time.perf_counter() - started) * 1000
+
+    async def get(self, db: AsyncSession, problem_id: int) -> ProblemSnapshot | None:
+        snapshot = self._snapshots.get(problem_id)
+        if snapshot is not None:
+            self.hits += 1
+            return snapshot
+
+        self.misses += 1
+        problem = await db.scalar(
+            select(Problem)
+            .options(selectinload(Problem.tests))
+            .where(Problem.id == problem_id)
+        )
+        if problem is None:
+            return None
+        return self.put(problem)
+
+    def put(self, problem: Problem) -> ProblemSnapshot:
+        """Snapshot of a problem row whose tests are loaded."""
+        snapshot = ProblemSnapshot.from_row(problem)
+        self._snapshots[snapshot.id] = snapshot
+        if self._changed is not None:
+            self._changed[snapshot.id] = snapshot
+        self.version += 1
+        return snapshot
+
+    def invalidate(self, problem_id: int):
+        if self._changed is not None:
+            self._changed[problem_id] = None
+        if self._snapshots.pop(problem_id, None) is not None:
+            self.version += 1
+
+    def stats(self) -> dict:
+        return {
+            "problems": len(self._snapshots),
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "last_load_ms": round(self.last_load_ms, 1),
+            "last_error": self.last_error,
+        }
+
+
+problem_catalog = ProblemCatalog()
@@ -0,0 +1,150 @@
+import json
+
+from pydantic import ValidationError
+from sqlalchemy import select, delete, insert
+
+from app.config import PROBLEM_IMPORT_BATCH
+from app.database import AsyncSessionLocal, dialect_insert
+from app.models.problem import Problem
+from app.models.problem_tests import ProblemTest
+from app.schemas.problem import ProblemCreate
+from app.services.problem_catalog import problem_catalog
+from app.services.problem_index import problem_index
+from app.services.verdict_cache import verdict_cache
+
+
+# ====================================================
+# Bulk problem import (NDJSON)
+# ====================================================
+# One ProblemCreate JSON object per line. Records are validated one by one
+# and written in batches: one multi-row upsert of the problems (by title),
+# one DELETE of the old tests of updated problems and one multi-row INSERT
+# of the tests, per transaction. A batch the DB rejects is retried record
+# by record, so one bad record never costs the others.
+# Used by POST /problems/import and `python -m app.import_problems`.
+MAX_REPORTED_ERRORS = 1000
+
+_FIELDS = ("description", "language", "difficulty", "code_with_bug", "fixed_code")
+
+
+async def ndjson_lines(chunks):
+    """Lines of a stream of byte chunks (a request body, a file)."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+def _parse(line: bytes) -> ProblemCreate:
+    try:
+        return ProblemCreate.model_validate(json.loads(line))
+    except ValidationError as e:
+        raise ValueError("; ".join(
+            f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()
+        ))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"invalid JSON: {e}")
+
+
+async def _write_batch(db, batch: list[tuple[int, ProblemCreate]]) -> tuple[dict, set]:
+    """Upsert one batch (caller commits). Returns ({title: id}, ids that existed)."""
+    titles = [p.title for _, p in batch]
+    existing = set((await db.scalars(
+        select(Problem.id).where(Problem.title.in_(titles))
+    )).all())
+
+    upsert = dialect_insert(db)(Problem).values([
+        {"title": p.title, **{f: getattr(p, f) for f in _FIELDS}} for _, p in batch
+    ])
+    upsert = upsert.on_conflict_do_update(
+        index_elements=["title"],
+        set_={f: upsert.excluded[f] for f in _FIELDS}
+    ).returning(Problem.id, Problem.title)
+    ids = {title: problem_id for problem_id, title in (await db.execute(upsert)).all()}
+
+    if existing:
+        # an updated problem gets exactly the tests of the new record
+        await db.execute(delete(ProblemTest).where(ProblemTest.problem_id.in_(existing)))
+    tests = [
+        {"problem_id": ids[p.title], "input": t.input, "expected_output": t.expected_output}
+        for _, p in batch
+        for t in p.tests
+    ]
+    if tests:
+        await db.execute(insert(ProblemTest), tests)
+    return ids, existing
+
+
+def _publish(batch: list[tuple[int, ProblemCreate]], ids: dict, existing: set):
+    # this worker's caches; other workers pick the changes up on reload
+    for _, p in batch:
+        problem_id = ids[p.title]
+        verdict_cache.invalidate_problem(problem_id)
+        problem_catalog.invalidate(problem_id)
+        if problem_id in existing:
+            problem_index.remove(problem_id)  # difficulty / language may have changed
+        problem_index.add(problem_id, p.difficulty, p.language)
+
+
+async def import_problems(lines, batch_size: int = PROBLEM_IMPORT_BATCH,
+                          session_factory=AsyncSessionLocal) -> dict:
+    """
+    Import an (async) iterable of NDJSON lines. Returns the report:
+    created / updated / failed counts and the errors by line number.
+    """
+    report = {"created": 0, "updated": 0, "failed": 0, "errors": []}
+
+    def fail(line_no: int, title, error: str):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": line_no, "title": title, "error": error})
+
+    async def flush(batch):
+        if not batch:
+            return
+        try:
+            async with session_factory() as db:
+                ids, existing = await _write_batch(db, batch)
+                await db.commit()
+        except Exception as e:
+            if len(batch) == 1:
+                fail(batch[0][0], batch[0][1].title, repr(e))
+                return
+            # isolate the bad record; the others still go in, in order
+            for record in batch:
+                await flush([record])
+            return
+
+        _publish(batch, ids, existing)
+        report["updated"] += len(existing)
+        report["created"] += len(batch) - len(existing)
+
+    batch: list[tuple[int, ProblemCreate]] = []
+    titles: set[str] = set()
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            problem = _parse(line)
+        except ValueError as e:
+            fail(line_no, None, str(e))
+            continue
+
+        if problem.title in titles:
+            # same title twice: the later record wins, in order
+            await flush(batch)
+            batch, titles = [], set()
+        batch.append((line_no, problem))
+        titles.add(problem.title)
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch, titles = [], set()
+
+    await flush(batch)
+    return report
@@ -0,0 +1,124 @@
+import asyncio
+import random
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import PROBLEM_INDEX_REFRESH_SECONDS
+from app.models.problem import Problem
+from app.services.problem_catalog import problem_catalog, ProblemSnapshot
+
+
+def _mask_of(ids) -> int:
+    """Int with bit `id` set for every id, built in one pass over a bytearray."""
+    if not ids:
+        return 0
+    bits = bytearray(max(ids) // 8 + 1)
+    for problem_id in ids:
+        bits[problem_id >> 3] |= 1 << (problem_id & 7)
+    return int.from_bytes(bits, "little")
+
+
+class ProblemIndex:
+    """
+    In-process index of problem ids bucketed by difficulty and language.
+
+    Picking a random problem samples an id here and fetches only that row,
+    so the cost stays the same however large the problem table gets. The
+    index is loaded once (id, difficulty, language only), updated by
+    `create_problem`, and fully reloaded every `PROBLEM_INDEX_REFRESH_SECONDS`
+    to pick up problems added by other workers.
+    """
+
+    def __init__(self, refresh_seconds: float = PROBLEM_INDEX_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        # (difficulty | None, language | None) -> problem ids
+        self._buckets: dict[tuple, list[int]] = {}
+        self._known: set[int] = set()
+        # bit `id` is set for every known problem id (see seen_cache)
+        self.mask = 0
+        self._loaded_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _keys(difficulty: str, language: str):
+        return (None, None), (difficulty, None), (None, language), (difficulty, language)
+
+    def add(self, problem_id: int, difficulty: str, language: str):
+        if problem_id in self._known:
+            return
+        self._known.add(problem_id)
+        self.mask |= 1 << problem_id
+        for key in self._keys(difficulty, language):
+            self._buckets.setdefault(key, []).append(problem_id)
+
+    def remove(self, problem_id: int):
+        # rare (stale id) – a linear scan is fine
+        self._known.discard(problem_id)
+        self.mask &= ~(1 << problem_id)
+        for bucket in self._buckets.values():
+            if problem_id in bucket:
+                bucket.remove(problem_id)
+
+    def ids(self, difficulty: str | None = None, language: str | None = None) -> list[int]:
+        return self._buckets.get((difficulty or None, language or None), [])
+
+    def sample(self, difficulty: str | None = None, language: str | None = None) -> int | None:
+        bucket = self.ids(difficulty, language)
+        return random.choice(bucket) if bucket else None
+
+    async def load(self, db: AsyncSession):
+        rows = (await db.execute(
+            select(Problem.id, Problem.difficulty, Problem.language)
+        )).all()
+
+        buckets: dict[tuple, list[int]] = {}
+        known: set[int] = set()
+        for problem_id, difficulty, language in rows:
+            if problem_id in known:
+                continue
+            known.add(problem_id)
+            for key in self._keys(difficulty, language):
+                buckets.setdefault(key, []).append(problem_id)
+
+        # built once and swapped in – `mask |= 1 << id` per row would copy
+        # the ever-growing int every time (quadratic in the number of ids)
+        self._buckets, self._known, self.mask = buckets, known, _mask_of(known)
+        self._loaded_at = time.monotonic()
+
+    async def ensure_loaded(self, db: AsyncSession):
+        fresh = (
+            self._loaded_at is not None
+            and time.monotonic() - self._loaded_at < self.refresh_seconds
+        )
+        if fresh:
+            return
+        async with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_seconds:
+                await self.load(db)
+
+    async def fetch(self, db: AsyncSession, problem_id: int) -> ProblemSnapshot | None:
+        """One problem (from the catalog); an id that no longer exists is dropped."""
+        problem = await problem_catalog.get(db, problem_id)
+        if problem is None:
+            # deleted behind our back
+            self.remove(problem_id)
+        return problem
+
+    async def pick(self, db: AsyncSession, difficulty: str | None = None,
+                   language: str | None = None) -> ProblemSnapshot | None:
+        """Random problem of the bucket, fetched by primary key."""
+        await self.ensure_loaded(db)
+
+        for _ in range(3):
+            problem_id = self.sample(difficulty, language)
+            if problem_id is None:
+                return None
+            problem = await self.fetch(db, problem_id)
+            if problem:
+                return problem
+        return None
+
+
+problem_index = ProblemIndex()
@@ -0,0 +1,287 @@
+import asyncio
+from functools import partial
+
+from sqlalchemy import select, update
+
+from app.database import AsyncSessionLocal, dialect_insert
+from app.models.room import Room
+from app.models.room_player import RoomPlayer
+from app.models.active_problem import ActiveProblem
+from app.models.UserSeenProblem import UserSeenProblem
+from app.models.user import User
+from app.services.problem_index import problem_index
+from app.services.problem_catalog import problem_catalog
+from app.services.seen_cache import seen_cache
+from app.services.write_behind import write_behind
+
+
+# ====================================================
+# Room state engine
+# ====================================================
+# Live state of the rooms whose sockets are on this worker. Room events are
+# applied here first and persisted through the write-behind queue, so
+# submit_solution / next_round_accept never wait for the database (apart
+# from reading the next round's problem row).
+#
+# The state of a room is authoritative on ONE worker: the one that claimed
+# the room on the backplane when its first socket arrived. A socket that
+# lands on any other worker is refused with ROOM_ELSEWHERE_CLOSE_CODE and
+# the client reconnects, so a round is never played against state another
+# worker doesn't have. Plain `uvicorn --workers N` works that way (a
+# reconnect may take a few tries); routing /ws/rooms/{room_id} by room id
+# (e.g. nginx `hash $request_uri consistent;`) gets it right first time.
+
+
+class PlayerState:
+    __slots__ = ("rp_id", "user_id", "username", "score", "connected")
+
+    def __init__(self, rp_id, user_id, username, score, connected):
+        self.rp_id = rp_id
+        self.user_id = user_id
+        self.username = username
+        self.score = score
+        self.connected = connected
+
+
+class RoundState:
+    __slots__ = ("problem", "round_number", "winner_user_id", "winner_name")
+
+    def __init__(self, problem, round_number, winner_user_id=None, winner_name=None):
+        self.problem = problem            # ProblemSnapshot (problem_catalog)
+        self.round_number = round_number
+        self.winner_user_id = winner_user_id
+        self.winner_name = winner_name
+
+
+class RoomState:
+    def __init__(self, room_id: int, status: str, current_round: int):
+        self.room_id = room_id
+        self.status = status
+        self.current_round = current_round
+        self.players: dict[int, PlayerState] = {}
+        self.round: RoundState | None = None
+        # serializes round starts of the room
+        self.lock = asyncio.Lock()
+
+    def connected_count(self) -> int:
+        return sum(1 for p in self.players.values() if p.connected)
+
+    def other_player(self, user_id: int) -> PlayerState | None:
+        for p in self.players.values():
+            if p.user_id != user_id:
+                return p
+        return None
+
+
+# -------------------------
+# write-behind writes
+# -------------------------
+async def _write_connected(db, rp_id, connected):
+    await db.execute(
+        update(RoomPlayer).where(RoomPlayer.id == rp_id).values(connected=connected)
+    )
+
+
+async def _write_round(db, room_id, problem_id, round_number, user_ids):
+    db.add(ActiveProblem(
+        room_id=room_id,
+        problem_id=problem_id,
+        round_number=round_number,
+        winner_user_id=None
+    ))
+    await db.execute(
+        update(Room).where(Room.id == room_id).values(current_round=round_number)
+    )
+    # סימון שהבעיה נראתה על ידי שני השחקנים – one INSERT, rows already
+    # there are skipped by the unique (user_id, problem_id) index
+    insert = dialect_insert(db)
+    await db.execute(
+        insert(UserSeenProblem)
+        .values([{"user_id": user_id, "problem_id": problem_id} for user_id in user_ids])
+        .on_conflict_do_nothing()
+    )
+    await db.flush()
+
+
+async def _write_win(db, room_id, round_number, rp_id, user_id):
+    # the claim was already decided in memory; the IS NULL guard keeps the
+    # row right even if two workers ever served the same room
+    claimed = await db.execute(
+        update(ActiveProblem)
+        .where(
+            ActiveProblem.room_id == room_id,
+            ActiveProblem.round_number == round_number,
+            ActiveProblem.winner_user_id.is_(None)
+        )
+        .values(winner_user_id=user_id)
+    )
+    if not claimed.rowcount:
+        return
+    await db.execute(
+        update(RoomPlayer)
+        .where(RoomPlayer.id == rp_id)
+        .values(score_in_room=RoomPlayer.score_in_room + 1)
+    )
+
+
+class RoomEngine:
+
+    def __init__(self):
+        self.rooms: dict[int, RoomState] = {}
+        self._loading: dict[int, asyncio.Lock] = {}
+
+    # -------------------------
+    # loading
+    # -------------------------
+    async def get(self, room_id: int) -> RoomState | None:
+        state = self.rooms.get(room_id)
+        if state is not None:
+            return state
+
+        lock = self._loading.setdefault(room_id, asyncio.Lock())
+        async with lock:
+            state = self.rooms.get(room_id)
+            if state is None:
+                state = await self._load(room_id)
+                if state is not None:
+                    self.rooms[room_id] = state
+        self._loading.pop(room_id, None)
+        return state
+
+    async def _load(self, room_id: int) -> RoomState | None:
+        async with AsyncSessionLocal() as db:
+            room = await db.get(Room, room_id)
+            if not room:
+                return None
+            state = RoomState(room.id, room.status, room.current_round or 0)
+            await self._load_players(db, state)
+
+            active = await db.scalar(
+                select(ActiveProblem)
+                .where(ActiveProblem.room_id == room_id)
+                .order_by(ActiveProblem.round_number.desc())
+                .limit(1)
+            )
+            if active:
+                problem = await problem_catalog.get(db, active.problem_id)
+                winner = state.players.get(active.winner_user_id)
+                state.round = RoundState(
+                    problem, active.round_number, active.winner_user_id,
+                    winner.username if winner else None
+                )
+        return state
+
+    async def _load_players(self, db, state: RoomState):
+        rows = (await db.execute(
+            select(RoomPlayer, User.username)
+            .join(User, User.id == RoomPlayer.user_id)
+            .where(RoomPlayer.room_id == state.room_id)
+        )).all()
+        for rp, username in rows:
+            if rp.user_id not in state.players:
+                state.players[rp.user_id] = PlayerState(
+                    rp.id, rp.user_id, username, rp.score_in_room or 0, bool(rp.connected)
+                )
+
+    def evict(self, room_id: int):
+        self.rooms.pop(room_id, None)
+
+    # -------------------------
+    # events
+    # -------------------------
+    async def join(self, room_id: int, user_id: int) -> RoomState | None:
+        """State of the room, or None if it does not exist or user is not in it."""
+        state = await self.get(room_id)
+        if state is None:
+            return None
+
+        if user_id not in state.players:
+            # joined over HTTP after the room was loaded
+            async with AsyncSessionLocal() as db:
+                await self._load_players(db, state)
+            if user_id not in state.players:
+                return None
+        return state
+
+    def connect(self, state: RoomState, user_id: int):
+        player = state.players[user_id]
+        player.connected = True
+        write_behind.submit(partial(_write_connected, rp_id=player.rp_id, connected=True))
+
+    def leave(self, room_id: int, user_id: int):
+        """Player's socket is gone; the DB side is written by close_room_in_db."""
+        state = self.rooms.get(room_id)
+        if state and user_id in state.players:
+            state.players[user_id].connected = False
+
+    async def start_round(self, room_id: int, after_round: int):
+        """
+        Start round `after_round + 1`. Returns the RoundState, or None when
+        that round was already started (both players triggered it at once).
+        """
+        state = await self.get(room_id)
+        async with state.lock:
+            if state.current_round != after_round:
+                return None
+
+            players = list(state.players.values())
+            if len(players) != 2:
+                raise Exception("Room must have exactly 2 players to start a round.")
+            user_ids = [p.user_id for p in players]
+
+            async with AsyncSessionLocal() as db:
+                # בעיה ששני השחקנים עוד לא ראו (bitset בזיכרון, בלי NOT IN)
+                problem = await seen_cache.pick_unseen(db, user_ids)
+                if problem is None:
+                    # אם אין בעיות חדשות → fallback: בעיה אקראית מכל הבעיות
+                    print("[ROUND] no new problems available for both players, resetting seen problems.")
+                    problem = await problem_index.pick(db)
+
+            state.current_round += 1
+            state.round = RoundState(problem, state.current_round)
+            for user_id in user_ids:
+                seen_cache.mark(user_id, problem.id)
+
+            write_behind.submit(partial(
+                _write_round, room_id=room_id, problem_id=problem.id,
+                round_number=state.current_round, user_ids=user_ids
+            ))
+
+        print(f"[ROUND] new round {state.round.round_number} in room {room_id}")
+        return state.round
+
+    def open_round(self, room_id: int, problem_id: int) -> RoundState | None:
+        """The current round, if it is on `problem_id` and nobody solved it yet."""
+        state = self.rooms.get(room_id)
+        if not state or not state.round:
+            return None
+        rnd = state.round
+        if rnd.problem is None or rnd.problem.id != problem_id or rnd.winner_user_id is not None:
+            return None
+        return rnd
+
+    def claim_winner(self, room_id: int, rnd: RoundState, user_id: int) -> bool:
+        """
+        First-winner claim of the round: compare-and-set on the in-memory
+        round. No await between the check and the set, so of any number of
+        concurrent correct submissions exactly one gets True.
+        """
+        state = self.rooms.get(room_id)
+        if not state or state.round is not rnd or rnd.winner_user_id is not None:
+            return False
+
+        player = state.players[user_id]
+        rnd.winner_user_id = user_id
+        rnd.winner_name = player.username
+        player.score += 1
+        write_behind.submit(partial(
+            _write_win, room_id=room_id, round_number=rnd.round_number,
+            rp_id=player.rp_id, user_id=user_id
+        ))
+        return True
+
+    def stats(self) -> dict:
+        return {"rooms": len(self.rooms), "write_behind": write_behind.stats()}
+
+
+room_engine = RoomEngine()
@@ -0,0 +1,148 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete, or_, and_, exists
+
+from app.config import (
+    REAPER_INTERVAL_SECONDS,
+    REAPER_EMPTY_ROOM_AGE,
+    REAPER_MAX_ROOM_AGE,
+    REAPER_FINISHED_ROOM_AGE,
+    REAPER_BATCH,
+)
+from app.database import AsyncSessionLocal
+from app.models.room import Room
+from app.models.room_player import RoomPlayer
+from app.models.active_problem import ActiveProblem
+from app.services.connection_manager import manager
+from app.services.matchmaking import matchmaker
+from app.services.room_engine import room_engine
+
+
+class RoomReaper:
+    """
+    Periodic background cleanup of abandoned rooms.
+
+    Each run selects stale room ids in one set-based query and deletes
+    their active problems, players and the rooms themselves in bulk, at
+    most `batch` rooms per transaction. A room is stale when it is
+    - waiting / playing, older than `empty_age`, with no connected player
+    - waiting / playing and older than `max_age` (0 = never)
+    - finished and older than `finished_age` (0 = never)
+    Rooms with a socket on this worker are always skipped.
+    """
+
+    def __init__(self, interval: float = REAPER_INTERVAL_SECONDS,
+                 empty_age: float = REAPER_EMPTY_ROOM_AGE,
+                 max_age: float = REAPER_MAX_ROOM_AGE,
+                 finished_age: float = REAPER_FINISHED_ROOM_AGE,
+                 batch: int = REAPER_BATCH):
+        self.interval = interval
+        self.empty_age = empty_age
+        self.max_age = max_age
+        self.finished_age = finished_age
+        self.batch = batch
+        self._task: asyncio.Task | None = None
+
+        self.runs = 0
+        self.reaped_total = 0
+        self.last_reaped = 0
+        self.last_run_ms = 0.0
+        self.last_error: str | None = None
+
+    async def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reap()
+            except Exception as e:
+                self.last_error = repr(e)
+                print(f"[REAPER] run failed: {e!r}")
+
+    def _stale_condition(self, now: datetime):
+        active = Room.status.in_(["waiting", "playing"])
+        has_connected = exists().where(
+            RoomPlayer.room_id == Room.id,
+            RoomPlayer.connected == True
+        )
+
+        conditions = [and_(
+            active,
+            Room.created_at < now - timedelta(seconds=self.empty_age),
+            ~has_connected
+        )]
+        if self.max_age > 0:
+            conditions.append(and_(
+                active,
+                Room.created_at < now - timedelta(seconds=self.max_age)
+            ))
+        if self.finished_age > 0:
+            conditions.append(and_(
+                Room.status == "finished",
+                Room.created_at < now - timedelta(seconds=self.finished_age)
+            ))
+        return or_(*conditions)
+
+    async def reap(self) -> int:
+        """One run; returns the number of rooms deleted."""
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        live = list(manager.active_connections)  # sockets on this worker
+        stale = self._stale_condition(now)
+
+        reaped = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                query = select(Room.id).where(stale).limit(self.batch)
+                if live:
+                    query = query.where(Room.id.not_in(live))
+                ids = (await db.scalars(query)).all()
+                if not ids:
+                    break
+
+                await db.execute(delete(ActiveProblem).where(ActiveProblem.room_id.in_(ids)))
+                await db.execute(delete(RoomPlayer).where(RoomPlayer.room_id.in_(ids)))
+                await db.execute(delete(Room).where(Room.id.in_(ids)))
+                await db.commit()
+
+            for room_id in ids:
+                if room_id in room_engine.rooms:
+                    await manager.release_room(room_id)
+                room_engine.evict(room_id)
+                matchmaker.forget_room(room_id)
+            reaped += len(ids)
+            if len(ids) < self.batch:
+                break
+
+        self.runs += 1
+        self.last_reaped = reaped
+        self.reaped_total += reaped
+        self.last_run_ms = (time.perf_counter() - started) * 1000
+        self.last_error = None
+        if reaped:
+            print(f"[REAPER] removed {reaped} stale rooms in {self.last_run_ms:.1f} ms")
+        return reaped
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "reaped_total": self.reaped_total,
+            "last_reaped": self.last_reaped,
+            "last_run_ms": round(self.last_run_ms, 3),
+            "last_error": self.last_error,
+            "interval_seconds": self.interval,
+        }
+
+
+room_reaper = RoomReaper()
@@ -1,67 +1,67 @@
 # app/services/room_service.py
 
-from sqlalchemy.orm import Session
-from app.models.room import Room, RoomPlayer
-from app.models.problem import Problem
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.room import Room
+from app.models.room_player import RoomPlayer
 from app.models.active_problem import ActiveProblem
-import random
+from app.services.problem_index import problem_index
 
 
 class RoomService:
 
     @staticmethod
-    def create_room(db: Session) -> Room:
+    async def create_room(db: AsyncSession) -> Room:
         """Create a new room in waiting mode."""
         room = Room(status="waiting", current_round=0)
         db.add(room)
-        db.commit()
-        db.refresh(room)
+        await db.commit()
         return room
 
     @staticmethod
-    def join_room(db: Session, room_id: int, user_id: int) -> RoomPlayer:
+    async def join_room(db: AsyncSession, room_id: int, user_id: int) -> RoomPlayer:
         """Join a room. Raises if full or not found."""
-        room = db.query(Room).filter(Room.id == room_id).first()
+        room = await db.get(Room, room_id)
         if not room:
             raise ValueError("Room not found")
 
-        players_count = db.query(RoomPlayer).filter(RoomPlayer.room_id == room_id).count()
+        players_count = await db.scalar(
+            select(func.count()).select_from(RoomPlayer).where(RoomPlayer.room_id == room_id)
+        )
         if players_count >= 2:
             raise ValueError("Room is full")
 
         # Create room_player entry
         rp = RoomPlayer(room_id=room_id, user_id=user_id, connected=True)
         db.add(rp)
-        db.commit()
-        db.refresh(rp)
+        await db.commit()
 
         return rp
 
     @staticmethod
-    def get_room_players(db: Session, room_id: int):
+    async def get_room_players(db: AsyncSession, room_id: int):
         """Return a list of players in a room."""
-        return db.query(RoomPlayer).filter(RoomPlayer.room_id == room_id).all()
+        result = await db.execute(select(RoomPlayer).where(RoomPlayer.room_id == room_id))
+        return result.scalars().all()
 
     @staticmethod
-    def start_round(db: Session, room_id: int) -> ActiveProblem:
+    async def start_round(db: AsyncSession, room_id: int) -> ActiveProblem:
         """
         Start a new round:
         - increase room.current_round
-        - randomly pick a problem
+        - randomly pick a problem (by id, from the problem index)
         - create ActiveProblem entry
         """
-        room = db.query(Room).filter(Room.id == room_id).first()
+        room = await db.get(Room, room_id)
         if not room:
             raise ValueError("Room not found")
 
-        room.current_round += 1
-
         # Pick a random problem
-        problems = db.query(Problem).all()
-        if not problems:
+        problem = await problem_index.pick(db)
+        if not problem:
             raise ValueError("No problems available")
 
-        problem = random.choice(problems)
+        room.current_round += 1
 
         active = ActiveProblem(
             room_id=room_id,
@@ -69,40 +69,58 @@ class RoomService:
             round_number=room.current_round
         )
         db.add(active)
-        db.commit()
-        db.refresh(active)
+        await db.commit()
 
         return active
 
     @staticmethod
-    def get_active_problem(db: Session, room_id: int) -> ActiveProblem | None:
+    async def get_active_problem(db: AsyncSession, room_id: int) -> ActiveProblem | None:
         """Return the latest active problem."""
-        return (
-            db.query(ActiveProblem)
-            .filter(ActiveProblem.room_id == room_id)
+        return await db.scalar(
+            select(ActiveProblem)
+            .where(ActiveProblem.room_id == room_id)
             .order_by(ActiveProblem.round_number.desc())
-            .first()
+            .limit(1)
         )
 
     @staticmethod
-    def set_winner(db: Session, room_id: int, user_id: int):
+    async def set_winner(db: AsyncSession, room_id: int, user_id: int) -> tuple[bool, int, int]:
         """
         Mark the current round's ActiveProblem as solved by user_id.
         If already solved, we do nothing.
+
+        One UPDATE ... SET winner_user_id = COALESCE(winner_user_id, user_id)
+        RETURNING: of concurrent winners exactly one user sets it (the row is
+        locked / re-read under the write), and every caller – the loser too –
+        gets the round's winner and problem from that same statement, with no
+        second query. Returns (won, winner_user_id, problem_id); `won` means
+        user_id is the round's winner, so it is True again if the winner
+        submits twice.
         """
-        active = RoomService.get_active_problem(db, room_id)
-        if not active:
+        current = (
+            select(ActiveProblem.id)
+            .where(ActiveProblem.room_id == room_id)
+            .order_by(ActiveProblem.round_number.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        row = (await db.execute(
+            update(ActiveProblem)
+            .where(ActiveProblem.id == current)
+            .values(winner_user_id=func.coalesce(ActiveProblem.winner_user_id, user_id))
+            .returning(ActiveProblem.winner_user_id, ActiveProblem.problem_id)
+        )).first()
+        await db.commit()
+
+        if row is None:
             raise ValueError("No active problem found")
-
-        if active.winner_user_id is None:
-            active.winner_user_id = user_id
-            db.commit()
-            return True  # first winner
-        return False  # someone else already won
+        winner_user_id, problem_id = row
+        return winner_user_id == user_id, winner_user_id, problem_id
 
     @staticmethod
-    def is_room_ready(db: Session, room_id: int) -> bool:
+    async def is_room_ready(db: AsyncSession, room_id: int) -> bool:
         """Room is ready if it has exactly 2 players."""
-        count = db.query(RoomPlayer).filter(RoomPlayer.room_id == room_id).count()
+        count = await db.scalar(
+            select(func.count()).select_from(RoomPlayer).where(RoomPlayer.room_id == room_id)
+        )
         return count == 2
-
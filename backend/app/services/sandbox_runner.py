@@ -0,0 +1,196 @@
+"""
+Standalone runner executed inside the sandboxed interpreter by the local
+executors (`python -I -S -c <this file> [--serve]`, see
+`local_executor.limit_child` for the sandbox) and shipped as the program
+itself for batched Piston runs.
+
+It only uses the standard library and never imports `app`: it reads a JSON
+job `{"code": ..., "stdin": ...}` from stdin, runs the code with stdin/stdout/
+stderr redirected to in-memory buffers and writes a JSON result
+`{"stdout": ..., "stderr": ...}` back on the original stdout.
+
+A batch job carries `"stdins": [...]` instead of `"stdin"` (plus optional
+`"fail_fast"`) and is answered with `{"results": [...]}`, one
+`{"stdout", "stderr", "ms"}` entry per test. Expected outputs never come
+here – the submission could read them – the host compares the results.
+
+Without arguments it runs one job and exits. With `--serve` it stays warm
+and answers one job per line until stdin is closed.
+
+A submission runs in this interpreter and can reach anything in it (frames,
+modules, the protocol pipes), so a served process must not run code of
+another user afterwards – the warm pool recycles it after every job unless
+WARM_POOL_MAX_RUNS says otherwise. Restoring builtins / modules between
+jobs only limits what one job's tests leak into each other.
+"""
+import builtins
+import ctypes
+import io
+import json
+import os
+import resource
+import signal
+import sys
+import time
+import traceback
+
+MAX_OUTPUT = 64 * 1024  # chars kept of stdout / stderr
+RESULT_MARKER = "@@BUGHUNT_RESULT@@"
+PR_SET_DUMPABLE = 4
+
+# builtins as they were before any submission ran; the live module can be
+# patched by a run (builtins.input = ...), so every run starts from this copy
+_PRISTINE_BUILTINS = dict(vars(builtins))
+
+
+class TimeLimit(BaseException):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise TimeLimit()
+
+
+def _not_dumpable():
+    # other sandboxed processes run as the same uid: without this they could
+    # ptrace this one or read its /proc/<pid>/mem (another user's code)
+    try:
+        ctypes.CDLL(None).prctl(PR_SET_DUMPABLE, 0, 0, 0, 0)
+    except (OSError, AttributeError):
+        pass
+
+
+def _cpu_budget(seconds):
+    # CPU budget for the next run on top of what this process already used
+    if not seconds:
+        return
+    used = resource.getrusage(resource.RUSAGE_SELF)
+    spent = int(used.ru_utime + used.ru_stime)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (spent + seconds, hard))
+
+
+def _trim(text: str) -> str:
+    return text if len(text) <= MAX_OUTPUT else text[:MAX_OUTPUT]
+
+
+def _restore_builtins():
+    # undo patches of the shared builtins module (seen by imported modules)
+    live = vars(builtins)
+    if live != _PRISTINE_BUILTINS:
+        live.clear()
+        live.update(_PRISTINE_BUILTINS)
+
+
+def run_one(code: str, stdin: str, timeout: float | None = None) -> dict:
+    out, err = io.StringIO(), io.StringIO()
+    real = sys.stdin, sys.stdout, sys.stderr
+    sys.stdin, sys.stdout, sys.stderr = io.StringIO(stdin), out, err
+    started = time.perf_counter()
+
+    if timeout:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    try:
+        compiled = compile(code, "main.py", "exec")
+        # fresh namespace (and pristine builtins) for every run
+        namespace = {"__name__": "__main__", "__builtins__": dict(_PRISTINE_BUILTINS)}
+        exec(compiled, namespace)
+    except TimeLimit:
+        err.write("Time limit exceeded\n")
+    except SystemExit as e:
+        if e.code is not None and not isinstance(e.code, int):
+            err.write(f"{e.code}\n")
+    except SyntaxError as e:
+        err.write("".join(traceback.format_exception_only(type(e), e)))
+    except BaseException as e:
+        # hide the runner's own frame from the traceback
+        tb = e.__traceback__.tb_next if e.__traceback__ else None
+        err.write("".join(traceback.format_exception(type(e), e, tb)))
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        sys.stdin, sys.stdout, sys.stderr = real
+        _restore_builtins()
+
+    return {
+        "stdout": _trim(out.getvalue()),
+        "stderr": _trim(err.getvalue()),
+        "ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+
+
+def run_batch(job: dict) -> dict:
+    """All tests of one submission in this process, in order."""
+    results = []
+
+    for stdin in job["stdins"]:
+        _cpu_budget(job.get("cpu_seconds"))
+        result = run_one(job["code"], stdin or "", job.get("timeout"))
+        results.append(result)
+
+        # fail fast on errors / timeouts only; wrong output is the host's call
+        if result["stderr"] and job.get("fail_fast"):
+            break
+
+    return {"results": results}
+
+
+def run_job(job: dict) -> dict:
+    if "stdins" in job:
+        return run_batch(job)
+    _cpu_budget(job.get("cpu_seconds"))
+    return run_one(job["code"], job.get("stdin") or "", job.get("timeout"))
+
+
+def _private_stdio():
+    """
+    Move the protocol off fds 0/1 so the submission can't read the next job
+    or corrupt the result with os.read / os.write; both now hit /dev/null.
+    """
+    job_in = os.fdopen(os.dup(0), "r")
+    result_out = os.fdopen(os.dup(1), "w")
+
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+
+    return job_in, result_out
+
+
+def main():
+    _not_dumpable()
+    job_in, result_out = _private_stdio()
+
+    job = json.loads(job_in.read())
+    result = run_job(job)
+
+    # the marker lets callers find the result if the host adds output
+    result_out.write(RESULT_MARKER + json.dumps(result))
+    result_out.flush()
+
+
+def serve():
+    _not_dumpable()
+    job_in, result_out = _private_stdio()
+    baseline_modules = set(sys.modules)
+
+    for line in job_in:
+        result = run_job(json.loads(line))
+
+        # modules imported by the submission don't leak into the next run
+        for name in set(sys.modules) - baseline_modules:
+            del sys.modules[name]
+
+        # max RSS so far (KB on Linux) – the pool recycles fat workers
+        result["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result_out.write(json.dumps(result) + "\n")
+        result_out.flush()
+
+
+if __name__ == "__main__":
+    if "--serve" in sys.argv[1:]:
+        serve()
+    else:
+        main()
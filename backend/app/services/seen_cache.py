@@ -0,0 +1,98 @@
+import random
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import SEEN_CACHE_SIZE, SEEN_CACHE_TTL
+from app.models.UserSeenProblem import UserSeenProblem
+from app.services.problem_index import problem_index
+from app.services.ttl_cache import TTLCache
+
+
+def nth_set_bit(mask: int, k: int) -> int:
+    """Position of the k-th (0-based) set bit of `mask`."""
+    offset = 0
+    width = mask.bit_length()
+
+    # binary descent: keep the half that holds the k-th bit
+    while width > 64:
+        half = width // 2
+        low = mask & ((1 << half) - 1)
+        count = low.bit_count()
+        if k < count:
+            mask, width = low, half
+        else:
+            k -= count
+            mask >>= half
+            offset += half
+            width -= half
+
+    while k:
+        mask &= mask - 1  # drop the lowest set bit
+        k -= 1
+    return offset + (mask & -mask).bit_length() - 1
+
+
+def random_set_bit(mask: int) -> int | None:
+    if not mask:
+        return None
+    return nth_set_bit(mask, random.randrange(mask.bit_count()))
+
+
+class SeenCache:
+    """
+    Per-user bitset of seen problem ids (bit `problem_id` set = seen).
+
+    A user's bitset is loaded from `user_seen_problem` the first time they
+    start a round and kept up to date by `mark` when this worker writes new
+    rows. Rows written by other workers show up once the entry expires.
+    """
+
+    def __init__(self, maxsize: int = SEEN_CACHE_SIZE, ttl: float = SEEN_CACHE_TTL):
+        self._masks = TTLCache(maxsize, ttl)
+
+    async def get(self, db: AsyncSession, user_id: int) -> int:
+        mask = self._masks.get(user_id)
+        if mask is None:
+            rows = await db.scalars(
+                select(UserSeenProblem.problem_id).where(UserSeenProblem.user_id == user_id)
+            )
+            mask = 0
+            for problem_id in rows:
+                mask |= 1 << problem_id
+            self._masks.set(user_id, mask)
+        return mask
+
+    def mark(self, user_id: int, problem_id: int):
+        # not cached → the next `get` reads the new row from the DB anyway;
+        # cached → updated in place, still expiring at its original time so
+        # an active user's bitset picks up other workers' rows too
+        self._masks.update(user_id, lambda mask: mask | (1 << problem_id))
+
+    def forget(self, user_id: int):
+        self._masks.pop(user_id)
+
+    async def pick_unseen(self, db: AsyncSession, user_ids):
+        """Random problem none of `user_ids` has seen, or None."""
+        await problem_index.ensure_loaded(db)
+
+        seen = 0
+        for user_id in user_ids:
+            seen |= await self.get(db, user_id)
+
+        available = problem_index.mask & ~seen
+        for _ in range(3):
+            problem_id = random_set_bit(available)
+            if problem_id is None:
+                return None
+            problem = await problem_index.fetch(db, problem_id)
+            if problem:
+                return problem
+            available &= ~(1 << problem_id)
+        return None
+
+    def stats(self) -> dict:
+        return self._masks.stats()
+
+
+seen_cache = SeenCache()
@@ -0,0 +1,82 @@
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Small in-process LRU cache with an optional time-to-live per entry.
+
+    Not thread-safe: it is meant for the event loop, where nothing else runs
+    between two statements of a `get` / `set`.
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, expires = entry
+        if expires is not None and expires < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        self._data[key] = (value, expires)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def update(self, key, fn) -> bool:
+        """
+        Replace a live entry's value with `fn(value)`, keeping its expiry and
+        LRU position (an update doesn't extend its life); False when there is
+        no live entry.
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            return False
+        value, expires = entry
+        if expires is not None and expires < time.monotonic():
+            del self._data[key]
+            return False
+        self._data[key] = (fn(value), expires)
+        return True
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def pop_where(self, predicate) -> int:
+        """Drop every entry whose key matches; returns how many were dropped."""
+        doomed = [k for k in self._data if predicate(k)]
+        for k in doomed:
+            del self._data[k]
+        return len(doomed)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
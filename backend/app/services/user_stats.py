@@ -0,0 +1,88 @@
+from sqlalchemy import select, update, func, case, and_, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import dialect_insert
+from app.models.UserMatch import UserMatch
+from app.models.user_stats import UserStats
+
+
+# ====================================================
+# Per-user match totals
+# ====================================================
+# user_stats holds one row per user, bumped in the same transaction as the
+# user_matches rows of a finished room, so profiles never aggregate the
+# whole history. A user without a row yet (history from before the table
+# existed) is seeded from user_matches once.
+# UserMatch.winner is False for both losses and draws; a draw is a
+# non-win with rounds_won == rounds_lost (same rule as the frontend).
+_FIELDS = ("matches", "wins", "losses", "draws", "rounds_won", "rounds_lost")
+
+
+def _outcome(winner: bool, rounds_won: int, rounds_lost: int) -> tuple[int, int, int]:
+    if winner:
+        return 1, 0, 0
+    if rounds_won == rounds_lost:
+        return 0, 0, 1
+    return 0, 1, 0
+
+
+def _totals_query(user_id: int):
+    is_win = UserMatch.winner.is_(True)
+    is_draw = and_(UserMatch.winner.isnot(True), UserMatch.rounds_won == UserMatch.rounds_lost)
+    return (
+        select(
+            literal(user_id),
+            func.count(UserMatch.id),
+            func.coalesce(func.sum(case((is_win, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((is_win, 0), (is_draw, 0), else_=1)), 0),
+            func.coalesce(func.sum(case((is_draw, 1), else_=0)), 0),
+            func.coalesce(func.sum(UserMatch.rounds_won), 0),
+            func.coalesce(func.sum(UserMatch.rounds_lost), 0),
+        )
+        .where(UserMatch.user_id == user_id)
+        .having(func.count(UserMatch.id) > 0)
+    )
+
+
+async def _seed(db: AsyncSession, user_id: int):
+    insert = dialect_insert(db)
+    await db.execute(
+        insert(UserStats)
+        .from_select(["user_id", *_FIELDS], _totals_query(user_id))
+        .on_conflict_do_nothing()
+    )
+
+
+async def record_match(db: AsyncSession, user_id: int, winner: bool,
+                       rounds_won: int, rounds_lost: int):
+    """Add one finished match to the user's totals (caller commits)."""
+    wins, losses, draws = _outcome(winner, rounds_won, rounds_lost)
+    bumped = await db.execute(
+        update(UserStats)
+        .where(UserStats.user_id == user_id)
+        .values(
+            matches=UserStats.matches + 1,
+            wins=UserStats.wins + wins,
+            losses=UserStats.losses + losses,
+            draws=UserStats.draws + draws,
+            rounds_won=UserStats.rounds_won + (rounds_won or 0),
+            rounds_lost=UserStats.rounds_lost + (rounds_lost or 0),
+        )
+    )
+    if not bumped.rowcount:
+        # first match since user_stats exists: seed from the full history,
+        # which already includes this match once flushed
+        await db.flush()
+        await _seed(db, user_id)
+
+
+async def get_stats(db: AsyncSession, user_id: int) -> dict:
+    stats = await db.get(UserStats, user_id)
+    if stats is None:
+        await _seed(db, user_id)
+        await db.commit()
+        stats = await db.get(UserStats, user_id)
+    if stats is None:
+        # no matches at all
+        return {field: 0 for field in _FIELDS}
+    return {field: getattr(stats, field) for field in _FIELDS}
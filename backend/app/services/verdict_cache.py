@@ -0,0 +1,98 @@
+import ast
+import hashlib
+import json
+
+from app.config import VERDICT_CACHE_SIZE, VERDICT_CACHE_TTL
+from app.services.ttl_cache import TTLCache
+
+PYTHON_LANGUAGES = {"python", "python3", "py"}
+
+
+def normalize(code: str):
+    try:
+        tree = ast.parse(code)
+        return ast.dump(tree, annotate_fields=False, include_attributes=False)
+    except Exception:
+        return None  # קוד לא תקין – אי אפשר לפרסר
+
+
+def code_hash(code: str) -> str | None:
+    # same hash for whitespace / comment-only variants of the same program
+    normalized = normalize(code)
+    if normalized is None:
+        return None
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+
+def tests_version(problem) -> str:
+    # changes whenever a test of the problem is added, removed or edited
+    precomputed = getattr(problem, "tests_version", None)
+    if precomputed:
+        return precomputed  # ProblemSnapshot
+    data = [(t.input or "", t.expected_output or "") for t in problem.tests]
+    return hashlib.sha1(json.dumps(data).encode()).hexdigest()
+
+
+class VerdictCache:
+    """
+    Verdicts of `verify_solution` keyed by
+    `(problem_id, normalized_ast_hash, tests_version)`.
+
+    Only Python submissions that parse are cached. A submission that
+    normalizes to the problem's `fixed_code` is always a hit.
+    """
+
+    def __init__(self, maxsize: int = VERDICT_CACHE_SIZE, ttl: float = VERDICT_CACHE_TTL):
+        self._verdicts = TTLCache(maxsize, ttl)
+        # (problem_id, tests_version) -> hash of the problem's fixed_code
+        self._fixed = TTLCache(maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, user_code: str, problem):
+        if (problem.language or "").lower() not in PYTHON_LANGUAGES:
+            return None
+        digest = code_hash(user_code)
+        if digest is None:
+            return None
+        return problem.id, digest, tests_version(problem)
+
+    def get(self, key, problem):
+        verdict = self._verdicts.get(key)
+
+        if verdict is None and key[1] == self._fixed_hash(problem, key[2]):
+            # the known-good fix passes every test; feedback is the last test
+            last = (problem.tests[-1].expected_output or "").strip() if problem.tests else ""
+            verdict = (True, last, last, "")
+            self._verdicts.set(key, verdict)
+
+        if verdict is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return verdict
+
+    def _fixed_hash(self, problem, version: str):
+        fixed = self._fixed.get((problem.id, version))
+        if fixed is None:
+            fixed = code_hash(problem.fixed_code or "") or ""
+            self._fixed.set((problem.id, version), fixed)
+        return fixed
+
+    def set(self, key, verdict):
+        self._verdicts.set(key, verdict)
+
+    def invalidate_problem(self, problem_id: int):
+        self._verdicts.pop_where(lambda k: k[0] == problem_id)
+        self._fixed.pop_where(lambda k: k[0] == problem_id)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._verdicts),
+            "maxsize": self._verdicts.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+verdict_cache = VerdictCache()
@@ -1,6 +1,24 @@
-from app.services.piston import run_code
+import asyncio
 
-async def verify_solution(user_code: str, problem):
+from app.config import VERIFY_MODE, VERIFY_CONCURRENCY
+from app.services.executor import TRANSIENT_ERRORS
+from app.services.piston import run_code, run_code_batch
+from app.services.verdict_cache import verdict_cache
+
+
+def _check(test, stdout: str, stderr: str):
+    """Turn one run into the (correct, stdout, expected, stderr) tuple."""
+    expected = (test.expected_output or "").strip()
+    out = stdout.strip()
+    err = stderr.strip() if stderr else ""
+
+    # אם הייתה שגיאה בהרצה או שהפלט לא תואם
+    correct = not stderr and out == expected
+    return correct, out, expected, err
+
+
+async def verify_solution(user_code: str, problem, mode: str | None = None,
+                          concurrency: int | None = None):
     """
     מריץ את הקוד של המשתמש מול כל הטסטים של הבעיה.
     מחזיר:
@@ -9,33 +27,132 @@ async def verify_solution(user_code: str, problem):
       - expected האחרון
       - stderr אם היה
     """
+    mode = mode or VERIFY_MODE
 
-    last_stdout = ""
-    last_expected = ""
-    last_stderr = ""
+    # same code (up to whitespace / comments) against the same tests
+    key = verdict_cache.key_for(user_code, problem)
+    if key is not None:
+        cached = verdict_cache.get(key, problem)
+        if cached is not None:
+            return cached
 
-    for test in problem.tests:
-        stdin = test.input or ""
-        expected = (test.expected_output or "").strip()
+    if mode == "batch":
+        result = await _verify_batch(user_code, problem)
+    elif mode == "concurrent":
+        result = await _verify_concurrent(
+            user_code, problem, concurrency or VERIFY_CONCURRENCY
+        )
+    else:
+        result = await _verify_sequential(user_code, problem)
+
+    if key is not None and result[3] not in TRANSIENT_ERRORS:
+        verdict_cache.set(key, result)
+    return result
 
+
+async def _verify_sequential(user_code: str, problem):
+    result = (True, "", "", "")
+
+    for test in problem.tests:
         stdout, stderr = await run_code(
             language=problem.language,
             code=user_code,
-            stdin=stdin
+            stdin=test.input or ""
         )
 
         # שמור מידע על הטסט האחרון (למשוב)
-        last_stdout = stdout.strip()
-        last_expected = expected
-        last_stderr = stderr.strip() if stderr else ""
+        result = _check(test, stdout, stderr)
+        if not result[0]:
+            return result
 
-        # אם הייתה שגיאה בהרצה
-        if stderr:
-            return False, last_stdout, last_expected, last_stderr
+    # אם עבר על כל הטסטים
+    return result
 
-        # אם הפלט לא תואם
-        if stdout.strip() != expected.strip():
-            return False, last_stdout, last_expected, last_stderr
 
-    # אם עבר על כל הטסטים
-    return True, last_stdout, last_expected, last_stderr
+async def _verify_concurrent(user_code: str, problem, concurrency: int):
+    """
+    Run every test at once (at most `concurrency` in flight).
+
+    As soon as a test fails, every test after it is cancelled; tests before it
+    keep running, because one of them may fail too and the caller must get
+    the first failing test in test order, exactly like the sequential mode.
+    """
+    tests = list(problem.tests)
+    if not tests:
+        return True, "", "", ""
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(test):
+        async with sem:
+            stdout, stderr = await run_code(
+                language=problem.language,
+                code=user_code,
+                stdin=test.input or ""
+            )
+        return _check(test, stdout, stderr)
+
+    tasks = [asyncio.create_task(run_one(t)) for t in tests]
+    index = {task: i for i, task in enumerate(tasks)}
+    results: dict[int, tuple] = {}
+    first_failure = len(tasks)
+
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                i = index[task]
+                results[i] = task.result()
+                if not results[i][0] and i < first_failure:
+                    first_failure = i
+
+            if first_failure < len(tasks):
+                # only tests before the failure can still change the answer
+                for task in pending:
+                    if index[task] > first_failure:
+                        task.cancel()
+                pending = {t for t in pending if index[t] < first_failure}
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    if first_failure < len(tasks):
+        return results[first_failure]
+
+    # אם עבר על כל הטסטים – משוב מהטסט האחרון
+    return results[len(tasks) - 1]
+
+
+async def _verify_batch(user_code: str, problem):
+    """
+    Ship the code and every test stdin in one executor invocation that stops
+    at the first error. Outputs are compared here, against expected outputs
+    that never leave this process.
+    """
+    tests = list(problem.tests)
+    if not tests:
+        return True, "", "", ""
+
+    runs = await run_code_batch(
+        language=problem.language,
+        code=user_code,
+        stdins=[t.input or "" for t in tests],
+        expected=[t.expected_output or "" for t in tests],
+        fail_fast=True
+    )
+
+    result = (False, "", "", "No result from executor")
+    for test, run in zip(tests, runs):
+        result = _check(test, run.stdout, run.stderr)
+        if not result[0]:
+            return result
+
+    if len(runs) < len(tests):
+        # the batch stopped early without reporting a failure
+        return False, result[1], result[2], result[3] or "Executor stopped early"
+    return result
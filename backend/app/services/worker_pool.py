@@ -0,0 +1,189 @@
+import asyncio
+import json
+
+from app.config import (
+    LOCAL_EXECUTOR_WORKERS,
+    LOCAL_EXECUTOR_TIMEOUT,
+    LOCAL_EXECUTOR_CPU_SECONDS,
+    WARM_POOL_MAX_RUNS,
+    WARM_POOL_MAX_RSS_MB,
+    WARM_POOL_MAX_QUEUE,
+)
+from app.services.executor import (
+    Executor, RunResult, parse_batch, EXECUTOR_BUSY, WORKER_CRASHED, WORKER_EXITED,
+)
+from app.services.local_executor import (
+    sandbox_command, spawn_sandboxed, limit_child, kill_process, unsupported,
+)
+
+READ_LIMIT = 4 * 1024 * 1024  # one JSON result line
+
+
+class _Worker:
+    def __init__(self, proc):
+        self.proc = proc
+        self.runs = 0
+
+
+class WarmWorkerPool(Executor):
+    """
+    Pool of warm, sandboxed Python interpreters started ahead of time.
+
+    A worker gets one JSON job per line over its stdin pipe and runs it in a
+    fresh namespace with stdout/stderr captured (see `sandbox_runner.serve`),
+    so a run never pays interpreter startup. Workers are recycled after
+    `max_runs` jobs (by default after every one: a submission can tamper
+    with its interpreter, so it never runs another user's code), when their
+    RSS passes `max_rss_mb`, or when a job hits the wall-clock timeout.
+    """
+
+    def __init__(self,
+                 size: int = LOCAL_EXECUTOR_WORKERS,
+                 timeout: float = LOCAL_EXECUTOR_TIMEOUT,
+                 max_runs: int = WARM_POOL_MAX_RUNS,
+                 max_rss_mb: int = WARM_POOL_MAX_RSS_MB,
+                 max_queue: int = WARM_POOL_MAX_QUEUE):
+        self.size = size
+        self.timeout = timeout
+        self.max_runs = max_runs
+        self.max_rss_mb = max_rss_mb
+        self.max_queue = max_queue
+
+        self._idle: asyncio.Queue | None = None
+        self._spawning: set[asyncio.Task] = set()
+        self._closed = False
+
+        # metrics
+        self.queue_depth = 0
+        self.runs = 0
+        self.recycled = 0
+        self.rejected = 0
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize() if self._idle else 0,
+            "queue_depth": self.queue_depth,
+            "runs": self.runs,
+            "recycled": self.recycled,
+            "rejected": self.rejected,
+        }
+
+    async def _spawn(self) -> _Worker:
+        proc = await asyncio.create_subprocess_exec(
+            *sandbox_command("--serve"),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            env={"PYTHONIOENCODING": "utf-8"},
+            preexec_fn=limit_child,
+            limit=READ_LIMIT,
+        )
+        return _Worker(proc)
+
+    def _replace(self, worker: _Worker):
+        kill_process(worker.proc)
+        self.recycled += 1
+
+        async def spawn_one():
+            await worker.proc.wait()
+            new = await self._spawn()
+            if self._closed:
+                kill_process(new.proc)
+            else:
+                self._idle.put_nowait(new)
+
+        task = asyncio.create_task(spawn_one())
+        self._spawning.add(task)
+        task.add_done_callback(self._spawning.discard)
+
+    async def start(self):
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        for worker in await spawn_sandboxed(self._spawn, self.size):
+            self._idle.put_nowait(worker)
+
+    async def close(self):
+        self._closed = True
+        for task in list(self._spawning):
+            task.cancel()
+        if self._idle is None:
+            return
+        while not self._idle.empty():
+            worker = self._idle.get_nowait()
+            kill_process(worker.proc)
+            await worker.proc.communicate()
+
+    async def _run_job(self, job: dict, tests: int) -> tuple[dict | None, str]:
+        """Send one job to an idle worker; returns (result, error)."""
+        await self.start()
+
+        if self.max_queue and self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            return None, EXECUTOR_BUSY
+
+        self.queue_depth += 1
+        try:
+            worker = await self._idle.get()
+        finally:
+            self.queue_depth -= 1
+
+        job.update(timeout=self.timeout, cpu_seconds=LOCAL_EXECUTOR_CPU_SECONDS)
+        # the runner times every test itself; this only catches a stuck worker
+        wall = self.timeout * tests + 1
+
+        try:
+            worker.proc.stdin.write(json.dumps(job).encode() + b"\n")
+            await worker.proc.stdin.drain()
+            line = await asyncio.wait_for(worker.proc.stdout.readline(), wall)
+        except asyncio.TimeoutError:
+            self._replace(worker)
+            return None, "Time limit exceeded"
+        except (BrokenPipeError, ConnectionResetError):
+            self._replace(worker)
+            return None, WORKER_CRASHED
+        except BaseException:
+            # cancelled mid-run (e.g. verify stopped early): the worker may
+            # still be busy with this job, so it can't go back to the pool
+            self._replace(worker)
+            raise
+
+        if not line:
+            # killed by an rlimit (CPU / memory) or os._exit() in the submission
+            self._replace(worker)
+            return None, WORKER_EXITED
+
+        result = json.loads(line)
+        self.runs += 1
+        worker.runs += 1
+
+        if (worker.runs >= self.max_runs
+                or result.get("max_rss_kb", 0) > self.max_rss_mb * 1024):
+            self._replace(worker)
+        else:
+            self._idle.put_nowait(worker)
+
+        return result, ""
+
+    async def run(self, language: str, code: str, stdin: str):
+        error = unsupported(language)
+        if error:
+            return "", error
+
+        result, error = await self._run_job({"code": code, "stdin": stdin}, 1)
+        if result is None:
+            return "", error
+        return result["stdout"], result["stderr"]
+
+    async def run_batch(self, language, code, stdins, expected=None, fail_fast=False):
+        error = unsupported(language)
+        if error:
+            return [RunResult("", error, 0.0)]
+
+        # `expected` stays here: the host compares, the sandbox never sees it
+        job = {"code": code, "stdins": stdins, "fail_fast": fail_fast}
+        result, error = await self._run_job(job, len(stdins))
+        if result is None:
+            return [RunResult("", error, 0.0)]
+        return parse_batch(result)
@@ -0,0 +1,160 @@
+import asyncio
+import time
+from collections import deque
+
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.config import WRITE_BEHIND_BATCH, WRITE_BEHIND_INTERVAL_MS
+from app.database import AsyncSessionLocal
+
+
+def is_transient(e: Exception) -> bool:
+    """DB unreachable / restarting / locked / pool exhausted – worth retrying."""
+    if isinstance(e, (OperationalError, InterfaceError, PoolTimeoutError,
+                      ConnectionError, OSError, asyncio.TimeoutError)):
+        return True
+    return isinstance(e, DBAPIError) and e.connection_invalidated
+
+
+class _Flush:
+    """Queue marker: resolved once every write queued before it is committed."""
+
+    __slots__ = ("future",)
+
+    def __init__(self):
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class WriteBehindQueue:
+    """
+    Ordered, batched persistence of state that is already applied in memory.
+
+    A write is an `async def write(db)` that only executes statements; one
+    consumer task commits writes in the order they were queued, many per
+    transaction.
+
+    A batch that fails with a transient error (see `is_transient`) is
+    retried with a backoff capped at MAX_BACKOFF until the DB is back; later
+    writes wait behind it, so nothing is lost or reordered. Any other error
+    means a bad write: the batch is replayed one write per transaction, and
+    the write that still fails is logged and kept in `dead_letters`.
+    `flush()` waits for everything queued so far; `close()` drains the queue
+    on shutdown (for at most CLOSE_TIMEOUT seconds).
+    """
+
+    MAX_BACKOFF = 5.0
+    CLOSE_TIMEOUT = 30.0
+    DEAD_LETTERS = 1000
+
+    def __init__(self, batch_size: int = WRITE_BEHIND_BATCH,
+                 interval_ms: float = WRITE_BEHIND_INTERVAL_MS,
+                 session_factory=AsyncSessionLocal):
+        self.batch_size = batch_size
+        self.interval = interval_ms / 1000
+        self.session_factory = session_factory
+        self._queue: asyncio.Queue | None = None
+        self._consumer: asyncio.Task | None = None
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed = 0
+        self.dead_letters: deque[dict] = deque(maxlen=self.DEAD_LETTERS)
+
+    async def start(self):
+        if self._consumer is None:
+            self._queue = asyncio.Queue()
+            self._consumer = asyncio.create_task(self._run())
+
+    def submit(self, write):
+        if self._consumer is None:
+            # scripts that run without the app lifespan
+            self._queue = asyncio.Queue()
+            self._consumer = asyncio.get_running_loop().create_task(self._run())
+        self._queue.put_nowait(write)
+
+    async def flush(self):
+        if self._consumer is None:
+            return
+        marker = _Flush()
+        self._queue.put_nowait(marker)
+        await marker.future
+
+    async def close(self):
+        if self._consumer is None:
+            return
+        try:
+            await asyncio.wait_for(self.flush(), self.CLOSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            print(f"[WRITE-BEHIND] DB still unavailable at shutdown, "
+                  f"{self._queue.qsize()} queued writes not persisted")
+        self._consumer.cancel()
+        await asyncio.gather(self._consumer, return_exceptions=True)
+        self._consumer = None
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._queue.qsize() if self._queue else 0,
+            "written": self.written,
+            "batches": self.batches,
+            "retries": self.retries,
+            "failed": self.failed,
+            "dead_letters": list(self.dead_letters)[-10:],
+        }
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            if not isinstance(batch[0], _Flush):
+                # let a burst of writes share one transaction
+                await asyncio.sleep(self.interval)
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            writes = [w for w in batch if not isinstance(w, _Flush)]
+            if writes:
+                await self._apply(writes)
+            for item in batch:
+                if isinstance(item, _Flush) and not item.future.done():
+                    item.future.set_result(None)
+
+    async def _apply(self, writes):
+        try:
+            await self._commit(writes)
+            return
+        except Exception as e:
+            print(f"[WRITE-BEHIND] batch of {len(writes)} failed: {e!r}")
+
+        # isolate the bad write; the others still go in, in order
+        for write in writes:
+            try:
+                await self._commit([write])
+            except Exception as e:
+                self.failed += 1
+                self.dead_letters.append({"write": repr(write), "error": repr(e), "at": time.time()})
+                print(f"[WRITE-BEHIND] dead-lettered write {write!r}: {e!r}")
+
+    async def _commit(self, writes):
+        """Commit the writes in one transaction, retrying transient errors until they clear."""
+        attempt = 0
+        while True:
+            try:
+                async with self.session_factory() as db:
+                    for write in writes:
+                        await write(db)
+                    await db.commit()
+                self.written += len(writes)
+                self.batches += 1
+                return
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                delay = min(self.MAX_BACKOFF, 0.1 * 2 ** attempt)
+                attempt += 1
+                self.retries += 1
+                print(f"[WRITE-BEHIND] batch of {len(writes)} failed "
+                      f"(attempt {attempt}, retrying in {delay:.1f}s): {e!r}")
+                await asyncio.sleep(delay)
+
+
+write_behind = WriteBehindQueue()
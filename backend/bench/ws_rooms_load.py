@@ -0,0 +1,243 @@
+"""
+Load test of the room WebSocket: message latency with many concurrent rooms.
+
+Seeds a fresh SQLite DB (users, problems, rooms in "playing" state), starts
+the app under uvicorn in a subprocess and connects both players of every
+room. Each room then plays `--rounds` rounds of the next-round handshake:
+
+  - player 1 sends next_round_request; we time its own next_round_wait and
+    the next_round_request relayed to player 2 ("relay"),
+  - both send next_round_accept; we time round_start at both players from
+    the second accept ("round_start": vote, problem pick and round write,
+    i.e. the DB work of the handler).
+
+Phases run with an increasing number of rooms live at once; p99 should stay
+flat as the room count grows. Run from backend/:
+
+    python -m bench.ws_rooms_load --phases 10,100,1000 --rounds 5 --spread 10
+
+Rooms of a phase play their rounds at staggered times (a random pause of up
+to `--spread` seconds before each round), like real players, rather than
+all in the same millisecond.
+
+Results on a 1-vCPU container (server, SQLite and all 2000 client sockets
+share that core), one uvicorn worker, `--rounds 5 --spread 10`:
+
+      rooms  sockets  kind            n   p50 ms  p95 ms  p99 ms
+         10       20  relay          50      1.2     3.2    13.6
+         10       20  round_start    50      1.1     2.7     6.2
+        100      200  relay         500      1.3     4.7    10.5
+        100      200  round_start   500      1.2     5.6    12.4
+       1000     2000  relay        5000      2.3     7.2    18.3
+       1000     2000  round_start  5000      2.8     8.1    17.5
+
+p99 stays under 20 ms from 10 to 1000 rooms. With `--spread 2` (every room
+starts a round about every second) the one core is saturated at 1000 rooms
+and p99 goes to ~730 ms (relay) / ~870 ms (round_start), while the 10 and
+100 room phases stay at 2.6-13 ms; measure that rate with the server on its
+own cores before reading it as a server limit. When all sockets close at the
+end of a phase, SQLite can answer some of the disconnect writes with
+"database is locked"; Postgres doesn't have that single-writer limit.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def seed(rooms: int, problems: int) -> dict[int, tuple[str, str]]:
+    """Users, problems and playing rooms; returns {room_id: (token1, token2)}."""
+    # imported here: DATABASE_URL must be set first
+    import app.main  # noqa: F401  (configures every mapper)
+    from sqlalchemy import insert
+    from app.database import Base, engine
+    from app.models.problem import Problem
+    from app.models.problem_tests import ProblemTest
+    from app.models.room import Room
+    from app.models.room_player import RoomPlayer
+    from app.models.user import User
+    from app.security import create_access_token
+
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "username": f"bench{i}", "email": f"bench{i}@example.com",
+             "password_hash": "-", "score": 0}
+            for i in range(1, 2 * rooms + 1)
+        ])
+        conn.execute(insert(Problem), [
+            {"id": i, "title": f"bench problem {i}", "description": "echo",
+             "language": "python", "difficulty": "easy",
+             "code_with_bug": "print(1)", "fixed_code": "print(input())"}
+            for i in range(1, problems + 1)
+        ])
+        conn.execute(insert(ProblemTest), [
+            {"problem_id": i, "input": "1", "expected_output": "1"}
+            for i in range(1, problems + 1)
+        ])
+        conn.execute(insert(Room), [
+            {"id": r, "status": "playing", "current_round": 0} for r in range(1, rooms + 1)
+        ])
+        conn.execute(insert(RoomPlayer), [
+            {"room_id": r, "user_id": u, "score_in_room": 0, "connected": False}
+            for r in range(1, rooms + 1)
+            for u in (2 * r - 1, 2 * r)
+        ])
+
+    return {
+        r: (create_access_token({"sub": str(2 * r - 1)}),
+            create_access_token({"sub": str(2 * r)}))
+        for r in range(1, rooms + 1)
+    }
+
+
+# -------------------------------------
+# Clients
+# -------------------------------------
+async def _until(ws, event: str) -> dict:
+    while True:
+        message = json.loads(await ws.recv())
+        if message.get("event") == event:
+            return message
+
+
+async def connect_room(base: str, room_id: int, tokens):
+    import websockets
+
+    players = []
+    for token in tokens:
+        players.append(await websockets.connect(
+            f"{base}/ws/rooms/{room_id}?token={token}", max_queue=None, open_timeout=120
+        ))
+    # round 1 starts once both are connected
+    await asyncio.gather(*(_until(ws, "round_start") for ws in players))
+    return players
+
+
+async def play_room(p1, p2, rounds: int, spread: float,
+                    latencies: dict[str, list[float]]):
+    for _ in range(rounds):
+        await asyncio.sleep(random.uniform(0, spread))
+
+        started = time.perf_counter()
+        await p1.send(json.dumps({"event": "next_round_request"}))
+        await asyncio.gather(_until(p1, "next_round_wait"),
+                             _until(p2, "next_round_request"))
+        latencies["relay"].append((time.perf_counter() - started) * 1000)
+
+        await p1.send(json.dumps({"event": "next_round_accept"}))
+        await p2.send(json.dumps({"event": "next_round_accept"}))
+        started = time.perf_counter()
+        await asyncio.gather(_until(p1, "round_start"), _until(p2, "round_start"))
+        latencies["round_start"].append((time.perf_counter() - started) * 1000)
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run_phase(base: str, room_tokens: list, rounds: int, spread: float,
+                    connect_concurrency: int) -> dict[str, list[float]]:
+    latencies = {"relay": [], "round_start": []}
+    sem = asyncio.Semaphore(connect_concurrency)
+
+    async def connect(room_id, tokens):
+        async with sem:
+            return await connect_room(base, room_id, tokens)
+
+    # every room is connected (and idle) before the first one plays
+    rooms = await asyncio.gather(*(connect(r, t) for r, t in room_tokens))
+    try:
+        await asyncio.gather(*(
+            play_room(p1, p2, rounds, spread, latencies) for p1, p2 in rooms
+        ))
+    finally:
+        await asyncio.gather(*(ws.close() for pair in rooms for ws in pair))
+    return latencies
+
+
+def report(rooms: int, latencies: dict[str, list[float]]):
+    for kind, values in latencies.items():
+        print(f"{rooms:>7}  {2 * rooms:>7}  {kind:<11} {len(values):>5}  "
+              f"{statistics.median(values):>7.1f} {_percentile(values, 95):>7.1f} "
+              f"{_percentile(values, 99):>7.1f}", flush=True)
+
+
+async def wait_ready(port: int, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def main(args):
+    phases = [int(p) for p in args.phases.split(",")]
+    room_tokens = list(seed(sum(phases), args.problems).items())
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+         "--ws-max-queue", "1024"],
+        cwd=BACKEND_DIR, env=os.environ.copy(),
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        await wait_ready(port)
+        base = f"ws://127.0.0.1:{port}"
+
+        print("  rooms  sockets  kind            n   p50 ms  p95 ms  p99 ms")
+        offset = 0
+        for rooms in phases:
+            # every phase gets rooms nobody has played in yet
+            batch = room_tokens[offset:offset + rooms]
+            offset += rooms
+            latencies = await run_phase(base, batch, args.rounds, args.spread,
+                                        args.connect_concurrency)
+            report(rooms, latencies)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--phases", default="10,100,1000",
+                        help="rooms live at once, per phase (comma separated)")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--spread", type=float, default=10.0,
+                        help="max random pause (s) before each round of a room")
+    parser.add_argument("--problems", type=int, default=200)
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bughunt-bench-"), "bench.db")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{db_path}")
+    # no submissions are run; piston needs no sandbox privileges to start
+    os.environ.setdefault("EXECUTOR_BACKEND", "piston")
+    os.environ.setdefault("HASH_WORKERS", "1")
+    os.environ.setdefault("WS_SEND_TIMEOUT", "10")
+    # rooms of later phases sit empty while earlier phases run
+    os.environ.setdefault("REAPER_EMPTY_ROOM_AGE", "3600")
+    asyncio.run(main(args))
@@ -0,0 +1,130 @@
+"""initial schema
+
+The tables as Base.metadata.create_all built them before migrations
+existed. Tables that are already there (a database created by create_all)
+are left alone, so `alembic upgrade head` works on old and new databases.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _existing_tables() -> set[str]:
+    if context.is_offline_mode():
+        return set()
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade():
+    existing = _existing_tables()
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("username", sa.String(), nullable=False),
+            sa.Column("password_hash", sa.String(), nullable=False),
+            sa.Column("score", sa.Integer()),
+            sa.Column("is_admin", sa.Boolean()),
+            sa.Column("email", sa.String(), nullable=False),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if "problems" not in existing:
+        op.create_table(
+            "problems",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("title", sa.String(), nullable=False),
+            sa.Column("description", sa.Text()),
+            sa.Column("language", sa.String(), nullable=False),
+            sa.Column("difficulty", sa.String(), nullable=False),
+            sa.Column("code_with_bug", sa.Text(), nullable=False),
+            sa.Column("fixed_code", sa.Text(), nullable=False),
+        )
+        op.create_index("ix_problems_id", "problems", ["id"])
+        op.create_index("ix_problems_title", "problems", ["title"], unique=True)
+
+    if "problem_tests" not in existing:
+        op.create_table(
+            "problem_tests",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("problem_id", sa.Integer(), sa.ForeignKey("problems.id")),
+            sa.Column("input", sa.String()),
+            sa.Column("expected_output", sa.String(), nullable=False),
+        )
+        op.create_index("ix_problem_tests_id", "problem_tests", ["id"])
+
+    if "rooms" not in existing:
+        op.create_table(
+            "rooms",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("status", sa.String()),
+            sa.Column("invite_code", sa.String(), unique=True),
+            sa.Column("current_round", sa.Integer()),
+            sa.Column("created_at", sa.DateTime()),
+        )
+        op.create_index("ix_rooms_id", "rooms", ["id"])
+
+    if "room_players" not in existing:
+        op.create_table(
+            "room_players",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("room_id", sa.Integer(), sa.ForeignKey("rooms.id")),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+            sa.Column("score_in_room", sa.Integer()),
+            sa.Column("connected", sa.Boolean()),
+            sa.Column("ready_for_next", sa.Boolean()),
+        )
+
+    if "active_problems" not in existing:
+        op.create_table(
+            "active_problems",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("room_id", sa.Integer(), sa.ForeignKey("rooms.id"), nullable=False),
+            sa.Column("problem_id", sa.Integer(), sa.ForeignKey("problems.id"), nullable=False),
+            sa.Column("winner_user_id", sa.Integer(), sa.ForeignKey("users.id")),
+            sa.Column("round_number", sa.Integer()),
+        )
+        op.create_index("ix_active_problems_id", "active_problems", ["id"])
+
+    if "user_matches" not in existing:
+        op.create_table(
+            "user_matches",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+            sa.Column("room_id", sa.Integer()),
+            sa.Column("opponent_name", sa.String()),
+            sa.Column("winner", sa.Boolean()),
+            sa.Column("rounds_won", sa.Integer()),
+            sa.Column("rounds_lost", sa.Integer()),
+            sa.Column("created_at", sa.DateTime()),
+        )
+
+    if "user_seen_problem" not in existing:
+        op.create_table(
+            "user_seen_problem",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("problem_id", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime()),
+        )
+        op.create_index("ix_user_seen_problem_id", "user_seen_problem", ["id"])
+
+
+def downgrade():
+    for table in (
+        "user_seen_problem", "user_matches", "active_problems", "room_players",
+        "rooms", "problem_tests", "problems", "users",
+    ):
+        op.drop_table(table)
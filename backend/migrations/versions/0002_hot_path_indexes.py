@@ -0,0 +1,97 @@
+"""hot-path indexes and user_stats
+
+Indexes for the lookups every request / socket event does:
+- room_players.room_id / user_id (room membership, find-match)
+- active_problems (room_id, round_number) (latest round of a room)
+- problem_tests.problem_id (tests of a problem)
+- users.score (leaderboard reload)
+- user_matches (user_id, created_at DESC, id DESC) (match history pages;
+  also covers plain user_id filters)
+- user_seen_problem (user_id, problem_id) UNIQUE (duplicates are removed
+  first; seen marks rely on it for ON CONFLICT DO NOTHING)
+- rooms (status, created_at) partial, only waiting / playing rooms
+and the user_stats table of per-user match totals.
+
+On PostgreSQL the indexes are built CONCURRENTLY, outside a transaction,
+so live tables are not locked against writes while they build. Every step
+is skipped when its index / table already exists (databases that ran
+create_all with the current models).
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+OPEN_ROOMS = sa.text("status IN ('waiting', 'playing')")
+
+INDEXES = [
+    ("ix_room_players_room_id", "room_players", ["room_id"], {}),
+    ("ix_room_players_user_id", "room_players", ["user_id"], {}),
+    ("ix_active_problems_room_round", "active_problems", ["room_id", "round_number"], {}),
+    ("ix_problem_tests_problem_id", "problem_tests", ["problem_id"], {}),
+    ("ix_users_score", "users", ["score"], {}),
+    ("ix_user_matches_user_created_id", "user_matches",
+     ["user_id", sa.text("created_at DESC"), sa.text("id DESC")], {}),
+    ("ux_user_seen_problem_user_problem", "user_seen_problem",
+     ["user_id", "problem_id"], {"unique": True}),
+    ("ix_rooms_open_status_created", "rooms", ["status", "created_at"],
+     {"postgresql_where": OPEN_ROOMS, "sqlite_where": OPEN_ROOMS}),
+]
+
+
+def _is_postgres() -> bool:
+    return context.get_context().dialect.name == "postgresql"
+
+
+def _existing_tables() -> set[str]:
+    if context.is_offline_mode():
+        return set()
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade():
+    if "user_stats" not in _existing_tables():
+        op.create_table(
+            "user_stats",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("matches", sa.Integer(), nullable=False),
+            sa.Column("wins", sa.Integer(), nullable=False),
+            sa.Column("losses", sa.Integer(), nullable=False),
+            sa.Column("draws", sa.Integer(), nullable=False),
+            sa.Column("rounds_won", sa.Integer(), nullable=False),
+            sa.Column("rounds_lost", sa.Integer(), nullable=False),
+        )
+
+    # keep the oldest row of every (user_id, problem_id) before going unique
+    op.execute(
+        "DELETE FROM user_seen_problem WHERE EXISTS ("
+        " SELECT 1 FROM user_seen_problem AS older"
+        " WHERE older.user_id = user_seen_problem.user_id"
+        " AND older.problem_id = user_seen_problem.problem_id"
+        " AND older.id < user_seen_problem.id)"
+    )
+
+    if _is_postgres():
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        with context.get_context().autocommit_block():
+            for name, table, columns, kw in INDEXES:
+                op.create_index(name, table, columns, if_not_exists=True,
+                                postgresql_concurrently=True, **kw)
+    else:
+        for name, table, columns, kw in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, **kw)
+
+
+def downgrade():
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
+    op.drop_table("user_stats")
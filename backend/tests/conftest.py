@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# the app reads its config at import time – point it at a throwaway DB first
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bughunt-test-'), 'test.db')}"
+)
+os.environ.setdefault("EXECUTOR_BACKEND", "local")
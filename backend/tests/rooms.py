@@ -0,0 +1,71 @@
+"""Helpers of the room tests: a seeded playing room and one event loop per test."""
+import asyncio
+import itertools
+import json
+
+from sqlalchemy import select
+
+import app.main  # noqa: F401  (configures every mapper)
+from app.database import AsyncSessionLocal, Base, async_engine
+from app.models.problem import Problem
+from app.models.problem_tests import ProblemTest
+from app.models.room import Room
+from app.models.room_player import RoomPlayer
+from app.models.user import User
+from app.services.write_behind import write_behind
+
+_names = itertools.count()
+
+
+class FakeSocket:
+    """What the connection manager needs of a WebSocket: send_text / close."""
+
+    def __init__(self):
+        self.messages: list[dict] = []
+        self.closed = False
+
+    @property
+    def received(self) -> list[str]:
+        # event names, in order
+        return [m["event"] for m in self.messages]
+
+    async def send_text(self, text: str):
+        self.messages.append(json.loads(text))
+
+    async def close(self, code: int = 1000):
+        self.closed = True
+
+
+async def setup_room() -> tuple[int, list[int]]:
+    """A playing room with two players and a problem to play; returns (room id, user ids)."""
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSessionLocal() as db:
+        if await db.scalar(select(Problem.id).limit(1)) is None:
+            problem = Problem(title="echo", description="", language="python",
+                              difficulty="easy", code_with_bug="print(1)",
+                              fixed_code="print(input())")
+            problem.tests = [ProblemTest(input="1", expected_output="1")]
+            db.add(problem)
+
+        room = Room(status="playing", current_round=0)
+        names = [f"player{next(_names)}" for _ in range(2)]
+        users = [User(username=name, email=f"{name}@example.com", password_hash="-", score=0)
+                 for name in names]
+        db.add_all([room, *users])
+        await db.flush()
+        db.add_all([RoomPlayer(room_id=room.id, user_id=u.id, score_in_room=0) for u in users])
+        await db.commit()
+        return room.id, [u.id for u in users]
+
+
+def run(coro):
+    """Run a test scenario; pending room writes and DB connections end with its loop."""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await write_behind.close()
+            await async_engine.dispose()
+    return asyncio.run(main())
@@ -0,0 +1,220 @@
+"""
+RedisBackplane across two workers, against a fakeredis stand-in for Redis:
+broadcasts, `exclude`, votes, room ownership and the 4409 refusal.
+
+Run from backend/: `python -m pytest`
+"""
+import asyncio
+
+import pytest
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from rooms import FakeSocket, run, setup_room
+from app.main import app
+from app.security import create_access_token
+from app.services.backplane import RedisBackplane
+from app.services.connection_manager import (
+    ConnectionManager, ROOM_ELSEWHERE_CLOSE_CODE, manager,
+)
+from app.services.room_engine import room_engine
+
+
+def _backplane(server: FakeServer) -> RedisBackplane:
+    # one client per worker, all talking to the same Redis
+    return RedisBackplane(client=FakeRedis(server=server), prefix="test")
+
+
+async def _workers(n: int = 2) -> list[ConnectionManager]:
+    server = FakeServer()
+    workers = [ConnectionManager(backplane=_backplane(server)) for _ in range(n)]
+    for worker in workers:
+        await worker.start()
+    return workers
+
+
+async def _close(*workers: ConnectionManager):
+    for worker in workers:
+        await worker.close()
+
+
+async def _until(predicate, timeout: float = 2.0):
+    # pub/sub delivery to the other worker is asynchronous
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_broadcast_reaches_the_other_worker():
+    async def scenario():
+        a, b = await _workers()
+        ws_a, ws_b = FakeSocket(), FakeSocket()
+        await a.connect(1, ws_a)
+        await b.connect(1, ws_b)
+        # a socket of another room on b gets nothing
+        other_room = FakeSocket()
+        await b.connect(2, other_room)
+
+        await a.broadcast(1, {"event": "round_start"})
+        await _until(lambda: ws_b.received)
+        await asyncio.sleep(0.05)
+        await _close(a, b)
+        return ws_a, ws_b, other_room
+
+    ws_a, ws_b, other_room = asyncio.run(scenario())
+    # the local socket exactly once (not again from the backplane)
+    assert ws_a.received == ["round_start"]
+    assert ws_b.received == ["round_start"]
+    assert other_room.received == []
+
+
+def test_broadcast_except_excludes_the_sender_on_every_worker():
+    async def scenario():
+        a, b = await _workers()
+        sender, same_worker, remote = FakeSocket(), FakeSocket(), FakeSocket()
+        await a.connect(1, sender)
+        await a.connect(1, same_worker)
+        await b.connect(1, remote)
+
+        await a.broadcast_except(1, {"event": "opponent_join"}, sender)
+        await _until(lambda: remote.received)
+
+        # and from the other side: b's socket excluded, both of a's get it
+        await b.broadcast_except(1, {"event": "next_round_request"}, remote)
+        await _until(lambda: len(sender.received) == 1)
+        await asyncio.sleep(0.05)
+        await _close(a, b)
+        return sender, same_worker, remote
+
+    sender, same_worker, remote = asyncio.run(scenario())
+    assert sender.received == ["next_round_request"]
+    assert same_worker.received == ["opponent_join", "next_round_request"]
+    assert remote.received == ["opponent_join"]
+
+
+def test_close_room_closes_sockets_on_every_worker():
+    async def scenario():
+        a, b = await _workers()
+        ws_a, ws_b = FakeSocket(), FakeSocket()
+        await a.connect(1, ws_a)
+        await b.connect(1, ws_b)
+
+        await a.close_room(1)
+        await _until(lambda: ws_b.closed)
+        await _close(a, b)
+        return ws_a, ws_b, b
+
+    ws_a, ws_b, b = asyncio.run(scenario())
+    assert ws_a.closed and ws_b.closed
+    assert 1 not in b.active_connections
+
+
+def test_votes_are_shared():
+    async def scenario():
+        a, b = await _workers()
+        counts = [await a.add_vote(1, 10), await b.add_vote(1, 10)]  # same player twice
+        counts.append(await b.add_vote(1, 20))
+        await a.remove_vote(1, 20)
+        counts.append(await a.add_vote(1, 20))
+        await b.clear_votes(1)
+        counts.append(await a.add_vote(1, 10))
+
+        # two players voting at the same moment: exactly one sees 2
+        await b.clear_votes(1)
+        together = await asyncio.gather(a.add_vote(1, 10), b.add_vote(1, 20))
+        await _close(a, b)
+        return counts, together
+
+    counts, together = asyncio.run(scenario())
+    assert counts == [1, 1, 2, 2, 1]
+    assert sorted(together) == [1, 2]
+
+
+def test_room_has_one_owner():
+    async def scenario():
+        a, b = await _workers()
+        claims = [await a.claim_room(1), await b.claim_room(1), await a.claim_room(1)]
+        # releasing a room we don't own leaves the owner alone
+        await b.release_room(1)
+        claims.append(await b.claim_room(1))
+
+        await a.release_room(1)
+        claims.append(await b.claim_room(1))
+        claims.append(await a.claim_room(1))
+        await _close(a, b)
+        return claims
+
+    assert asyncio.run(scenario()) == [True, False, True, False, True, False]
+
+
+def test_concurrent_claims_have_one_winner():
+    async def scenario():
+        workers = await _workers(5)
+        claims = await asyncio.gather(*(w.claim_room(7) for w in workers))
+        await _close(*workers)
+        return claims
+
+    assert sorted(asyncio.run(scenario())) == [False] * 4 + [True]
+
+
+def test_heartbeat_keeps_the_claim_and_close_hands_it_over():
+    async def scenario():
+        server = FakeServer()
+        owner, other = _backplane(server), _backplane(server)
+        for backplane in (owner, other):
+            backplane.OWNER_TTL = 1  # refreshed every 1/3 s
+            await backplane.start(lambda room_id, envelope: None)
+
+        assert await owner.claim_room(1)
+        await asyncio.sleep(2.5)  # well past the TTL
+        still_owned = not await other.claim_room(1)
+
+        await owner.close()
+        handed_over = await other.claim_room(1)
+        await other.close()
+        return still_owned, handed_over
+
+    still_owned, handed_over = asyncio.run(scenario())
+    assert still_owned
+    assert handed_over
+
+
+def test_dead_owner_claim_expires():
+    async def scenario():
+        server = FakeServer()
+        dead, other = _backplane(server), _backplane(server)
+        dead.OWNER_TTL = 1
+        # claimed, but no heartbeat: the worker died without releasing it
+        assert await dead.claim_room(1)
+        refused = not await other.claim_room(1)
+        await asyncio.sleep(1.5)
+        return refused, await other.claim_room(1)
+
+    refused, claimed = asyncio.run(scenario())
+    assert refused
+    assert claimed
+
+
+def test_socket_on_a_non_owning_worker_is_closed_with_4409(monkeypatch):
+    room_id, user_ids = run(setup_room())
+
+    server = FakeServer()
+    owner = _backplane(server)
+    assert asyncio.run(owner.claim_room(room_id))
+    # this worker's manager sees the same Redis, where another worker owns the room
+    monkeypatch.setattr(manager, "backplane", _backplane(server))
+
+    token = create_access_token({"sub": str(user_ids[0])})
+    client = TestClient(app)
+    with pytest.raises(WebSocketDisconnect) as refused:
+        with client.websocket_connect(f"/ws/rooms/{room_id}?token={token}") as ws:
+            ws.receive_text()
+
+    assert refused.value.code == ROOM_ELSEWHERE_CLOSE_CODE
+    # the room's state was not kept on the refusing worker
+    assert room_id not in room_engine.rooms
+    # drop the DB connections the socket opened on the client's loop
+    run(asyncio.sleep(0))
@@ -0,0 +1,53 @@
+"""
+A player who queues while another one is opening a waiting room is handed
+that room right away instead of waiting out MATCH_TIMEOUT.
+
+Run from backend/: `python -m pytest`
+"""
+import asyncio
+import time
+
+from sqlalchemy import select
+
+from rooms import run, setup_room
+from app.database import AsyncSessionLocal
+from app.models.room import Room
+from app.services.matchmaking import Matchmaker, MATCH_FOUND
+
+TIMEOUT = 0.5
+
+
+def test_room_opened_on_timeout_goes_to_the_player_queued_meanwhile():
+    matchmaker = Matchmaker(timeout=TIMEOUT)
+    opening = asyncio.Event()
+    open_room = matchmaker._open_room
+
+    async def slow_open_room(bucket, user_id):
+        opening.set()
+        await asyncio.sleep(0.1)  # the second player arrives in here
+        return await open_room(bucket, user_id)
+
+    matchmaker._open_room = slow_open_room
+
+    async def scenario():
+        _, (first, second) = await setup_room()
+
+        first_match = asyncio.create_task(matchmaker.find_match(first, 0))
+        await asyncio.wait_for(opening.wait(), TIMEOUT * 2)
+
+        started = time.monotonic()
+        second_result = await matchmaker.find_match(second, 0)
+        waited = time.monotonic() - started
+        first_result = await first_match
+
+        async with AsyncSessionLocal() as db:
+            status = await db.scalar(select(Room.status).where(Room.id == first_result["room_id"]))
+        return first_result, second_result, waited, status
+
+    first_result, second_result, waited, status = run(scenario())
+
+    assert first_result == second_result == {"room_id": first_result["room_id"], "message": MATCH_FOUND}
+    assert status == "playing"
+    assert waited < TIMEOUT
+    assert matchmaker.stats()["queued"] == 0
+    assert matchmaker.stats()["open_rooms"] == 0
@@ -0,0 +1,83 @@
+"""
+Problem catalog reloads: paged, swapped in whole, and never undo a change
+made on this worker while they ran; `get` never waits on one.
+
+Run from backend/: `python -m pytest`
+"""
+import asyncio
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import selectinload
+
+from rooms import run
+from app.database import AsyncSessionLocal, Base, async_engine
+from app.models.problem import Problem
+from app.models.problem_tests import ProblemTest
+from app.services.problem_catalog import ProblemCatalog
+
+PROBLEMS = 1200
+
+
+async def _seed() -> list[int]:
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        first = (await conn.scalar(select(Problem.id).order_by(Problem.id.desc()).limit(1))) or 0
+        ids = list(range(first + 1, first + PROBLEMS + 1))
+        await conn.execute(insert(Problem), [
+            {"id": i, "title": f"catalog problem {i}", "description": "echo",
+             "language": "python", "difficulty": "easy",
+             "code_with_bug": "print(1)", "fixed_code": "print(input())"}
+            for i in ids
+        ])
+        await conn.execute(insert(ProblemTest), [
+            {"problem_id": i, "input": str(i), "expected_output": str(i)} for i in ids
+        ])
+    return ids
+
+
+def test_reload_is_paged_and_keeps_changes_made_meanwhile():
+    async def scenario():
+        ids = await _seed()
+        catalog = ProblemCatalog(refresh_seconds=0, batch=500)
+
+        async with AsyncSessionLocal() as db:
+            await catalog.load(db)
+            edited = await db.scalar(
+                select(Problem).options(selectinload(Problem.tests)).where(Problem.id == ids[0])
+            )
+            edited.title = "edited on this worker"
+
+        async with AsyncSessionLocal() as db:
+            reload = asyncio.create_task(catalog.load(db))
+            await asyncio.sleep(0)  # the reload is waiting on its first page
+            catalog.put(edited)
+            catalog.invalidate(ids[1])
+            await reload
+        return ids, catalog
+
+    ids, catalog = run(scenario())
+
+    assert catalog.stats()["problems"] >= PROBLEMS - 1
+    assert catalog._snapshots[ids[0]].title == "edited on this worker"
+    assert ids[1] not in catalog._snapshots
+    last = catalog._snapshots[ids[-1]]
+    assert last.tests == ((str(ids[-1]), str(ids[-1])),)
+
+
+def test_get_reads_the_snapshot_without_a_reload():
+    async def scenario():
+        ids = await _seed()
+        # due for a refresh on every call, if `get` did them
+        catalog = ProblemCatalog(refresh_seconds=1e-9)
+        async with AsyncSessionLocal() as db:
+            await catalog.load(db)
+        version = catalog.version
+        # no session: a hit must not touch the DB
+        snapshots = [await catalog.get(None, i) for i in ids]
+        return catalog, version, snapshots
+
+    catalog, version, snapshots = run(scenario())
+
+    assert all(s is not None for s in snapshots)
+    assert catalog.version == version
+    assert catalog.misses == 0
@@ -0,0 +1,167 @@
+"""
+Concurrent correct submissions of one round: exactly one winner, one point,
+and every other submitter gets the same solution_result.
+
+Submissions go through the room socket's handler (`submit_solution`) and
+the real `verify_solution`; only the code execution is a stand-in backend
+that answers after a random delay, so verifies finish in a random order and
+the claims interleave.
+
+Run from backend/: `python -m pytest`
+"""
+import asyncio
+import random
+
+from sqlalchemy import select
+
+from rooms import FakeSocket, run, setup_room
+from app.database import AsyncSessionLocal
+from app.models.active_problem import ActiveProblem
+from app.models.room_player import RoomPlayer
+from app.routers.ws_rooms import submit_solution, solution_message
+from app.services import executor
+from app.services.connection_manager import manager
+from app.services.room_engine import room_engine
+from app.services.room_service import RoomService
+from app.services.write_behind import write_behind
+
+N = 300
+
+
+class DelayedEchoExecutor(executor.Executor):
+    """Runs nothing: `print(input())` echoes stdin, after a random delay."""
+
+    def __init__(self, max_delay: float = 0.02):
+        self.max_delay = max_delay
+        self.runs = 0
+
+    async def run(self, language, code, stdin):
+        self.runs += 1
+        await asyncio.sleep(random.uniform(0, self.max_delay))
+        return (stdin if "print(input())" in code else ""), ""
+
+
+def _solution(i: int) -> str:
+    # a different AST per submission: no verdict cache hits, every one is run
+    return f"attempt = {i}\nprint(input())"
+
+
+def _solution_results(ws: FakeSocket) -> list[dict]:
+    return [m for m in ws.messages if m["event"] == "solution_result"]
+
+
+def test_concurrent_submissions_one_winner(monkeypatch):
+    fake = DelayedEchoExecutor()
+    monkeypatch.setattr(executor, "_executor", fake)
+
+    async def scenario():
+        room_id, user_ids = await setup_room()
+        rnd = await room_engine.start_round(room_id, after_round=0)
+        state = room_engine.rooms[room_id]
+
+        # one socket per submission, all in the room (the broadcast reaches each)
+        sockets = [FakeSocket() for _ in range(N)]
+        for ws in sockets:
+            await manager.connect(room_id, ws)
+
+        await asyncio.gather(*(
+            submit_solution(ws, state, user_ids[i % 2], rnd.problem.id, _solution(i))
+            for i, ws in enumerate(sockets)
+        ))
+        await write_behind.flush()
+
+        async with AsyncSessionLocal() as db:
+            winners = (await db.scalars(
+                select(ActiveProblem.winner_user_id).where(ActiveProblem.room_id == room_id)
+            )).all()
+            scores = (await db.scalars(
+                select(RoomPlayer.score_in_room).where(RoomPlayer.room_id == room_id)
+            )).all()
+
+        for ws in sockets:
+            await manager.disconnect(room_id, ws)
+        memory_scores = [p.score for p in state.players.values()]
+        return rnd, sockets, winners, scores, memory_scores
+
+    rnd, sockets, winners, scores, memory_scores = run(scenario())
+
+    assert fake.runs == N
+    # persisted once, in memory once
+    assert rnd.winner_user_id is not None
+    assert winners == [rnd.winner_user_id]
+    assert sorted(scores) == [0, 1]
+    assert sorted(memory_scores) == [0, 1]
+
+    # every socket got the one broadcast; every loser also got its own answer,
+    # and all of them are the same result
+    expected = solution_message(rnd)
+    results = [_solution_results(ws) for ws in sockets]
+    assert all(r and all(m == expected for m in r) for r in results)
+    assert sorted(len(r) for r in results) == [1] + [2] * (N - 1)
+
+
+def test_submission_for_a_round_superseded_during_verify_is_answered(monkeypatch):
+    monkeypatch.setattr(executor, "_executor", DelayedEchoExecutor(max_delay=0))
+
+    async def scenario():
+        room_id, user_ids = await setup_room()
+        rnd = await room_engine.start_round(room_id, after_round=0)
+        state = room_engine.rooms[room_id]
+
+        verifying = asyncio.Event()
+        real_run = executor._executor.run
+
+        async def slow_run(language, code, stdin):
+            verifying.set()
+            await asyncio.sleep(0.05)
+            return await real_run(language, code, stdin)
+
+        monkeypatch.setattr(executor._executor, "run", slow_run)
+
+        ws = FakeSocket()
+        submission = asyncio.create_task(
+            submit_solution(ws, state, user_ids[0], rnd.problem.id, "late = True\nprint(input())")
+        )
+        await asyncio.wait_for(verifying.wait(), 5)
+        # the room moved on while the solution was being verified
+        await room_engine.start_round(room_id, after_round=1)
+        await submission
+        await write_behind.flush()
+        return rnd, ws
+
+    rnd, ws = run(scenario())
+
+    assert rnd.winner_user_id is None
+    assert _solution_results(ws) == [{
+        "event": "solution_result", "correct": False, "error": "This round is not open",
+    }]
+
+
+def test_set_winner_concurrent():
+    async def scenario():
+        room_id, user_ids = await setup_room()
+        async with AsyncSessionLocal() as db:
+            active = await RoomService.start_round(db, room_id)
+
+        async def submit(user_id):
+            # one session per submission, like one request each
+            async with AsyncSessionLocal() as db:
+                return user_id, await RoomService.set_winner(db, room_id, user_id)
+
+        results = await asyncio.gather(*(submit(user_ids[i % 2]) for i in range(N)))
+
+        async with AsyncSessionLocal() as db:
+            winners = (await db.scalars(
+                select(ActiveProblem.winner_user_id).where(ActiveProblem.room_id == room_id)
+            )).all()
+        return active.problem_id, results, winners
+
+    problem_id, results, winners = run(scenario())
+
+    won = {user_id for user_id, (claimed, _, _) in results if claimed}
+    assert len(won) == 1
+    assert winners == list(won)
+    # every submission of the winner says so, every other one doesn't
+    assert all(claimed == (user_id in won) for user_id, (claimed, _, _) in results)
+    # losers learn the winner and problem from the same statement
+    assert {(winner, problem) for _, (_, winner, problem) in results} == {(*won, problem_id)}
@@ -7,6 +7,10 @@ import { cpp } from "@codemirror/lang-cpp";
 import { java } from "@codemirror/lang-java";
 import {  WS_URL } from "../config";
 
+// the room is served by another backend worker – connect again
+const ROOM_ELSEWHERE_CLOSE_CODE = 4409;
+const MAX_RECONNECTS = 20;
+
 export default function Room() {
   const { roomId } = useParams();
   const navigate = useNavigate();
@@ -27,6 +31,7 @@ export default function Room() {
   const [isRunning, setIsRunning] = useState(false);
 
   const [roundKey, setRoundKey] = useState(0);
+  const [connectAttempt, setConnectAttempt] = useState(0);
 
   function getLanguageExtension(lang: string) {
   switch (lang) {
@@ -91,6 +96,8 @@ export default function Room() {
             }
           });
 
+        } else if (data.error) {
+          setFeedback(`⚠ ${data.error}`);
         } else {
           setFeedback("❌ Incorrect fix");
         }
@@ -164,15 +171,19 @@ export default function Room() {
       }
     };
 
-    ws.onclose = () => {
+    ws.onclose = (ev) => {
       wsRef.current = null;
+      if (ev.code === ROOM_ELSEWHERE_CLOSE_CODE && connectAttempt < MAX_RECONNECTS) {
+        setWsConnected(false);
+        setTimeout(() => setConnectAttempt((n) => n + 1), 200);
+      }
     };
 
     return () => {
       wsRef.current?.close();
       wsRef.current = null;
     };
-  }, [roomId, token]);
+  }, [roomId, token, connectAttempt]);
 
   // ------------------------------------------------------------------
   // SEND EVENTS
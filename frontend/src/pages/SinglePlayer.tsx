@@ -70,7 +70,9 @@ export default function SinglePlayer() {
     const data = await res.json();
     setRunningTests(false);
 
-    if (data.correct) {
+    if (!res.ok) {
+      setFeedback(`⚠ ${data.detail || "Could not check your solution, try again"}`);
+    } else if (data.correct) {
       setFeedback("✔ Correct! Score updated.");
 
       const currentScore = Number(localStorage.getItem("score") || "0");